@@ -0,0 +1,143 @@
+"""
+양자화 모드별 recall / 지연시간 / RAM 비교 벤치마크
+
+사용법:
+  python bench_quantization.py retailtech_test --queries 50 --limit 300
+  python bench_quantization.py article_2025_image_test --cleanup
+  python bench_quantization.py retailtech_test --questions questions.txt
+
+- held-out 을 제외한 none 복제본에서 정답(exact=True) top-k 를 구하고
+- none / scalar(int8) / binary 복제 컬렉션에서 oversampling + rescore 검색 결과와 비교
+- 질의: --questions 파일(한 줄에 질문 하나)을 KURE-v1 로 인코딩,
+  없으면 저장된 벡터 일부를 질의로 쓰되 복제 컬렉션에서는 제외(held-out)해 자기 자신 매칭 방지
+- 벡터 RAM 은 측정값이 아닌 건수 x 차원 x 바이트 기반 추정치
+"""
+import argparse
+import random
+import time
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+from qdrant_schema import build_search_params, create_search_collection
+
+MODES = ["none", "scalar", "binary"]
+RAM_BYTES_PER_DIM = {"none": 4.0, "scalar": 1.0, "binary": 1 / 8}
+
+
+def copy_collection(client: QdrantClient, source: str, target: str, exclude_ids=frozenset(),
+                    batch_size: int = 256):
+    """source 포인트를 target 컬렉션으로 복사 (held-out 질의 포인트 제외)"""
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=source, limit=batch_size, offset=offset,
+            with_payload=True, with_vectors=True,
+        )
+        if points:
+            client.upsert(
+                collection_name=target,
+                points=[
+                    PointStruct(id=p.id, vector=p.vector, payload=p.payload)
+                    for p in points if p.id not in exclude_ids
+                ],
+            )
+        if offset is None:
+            break
+
+
+def wait_until_indexed(client: QdrantClient, name: str, timeout: float = 1800):
+    start = time.time()
+    while time.time() - start < timeout:
+        info = client.get_collection(name)
+        if info.status == "green":
+            return
+        time.sleep(2)
+    print(f"⚠️ {name} 인덱싱 대기 시간 초과")
+
+
+def sample_held_out(client: QdrantClient, name: str, n: int, seed: int = 0):
+    """저장된 벡터 n개를 질의로 샘플링 → (질의 벡터, 복제 시 제외할 ID)"""
+    points, _ = client.scroll(collection_name=name, limit=max(n * 20, 1000), with_vectors=True)
+    random.Random(seed).shuffle(points)
+    points = points[:n]
+    return [p.vector for p in points], {p.id for p in points}
+
+
+def encode_questions(path: str):
+    from sentence_transformers import SentenceTransformer
+    with open(path, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+    model = SentenceTransformer("nlpai-lab/KURE-v1", device="cpu")
+    return [v.tolist() for v in model.encode(questions, batch_size=32)]
+
+
+def run(collection: str, queries: int, limit: int, oversampling: float, cleanup: bool,
+        questions: str = None):
+    client = QdrantClient(host="localhost", port=6333)
+    info = client.get_collection(collection)
+    dim = info.config.params.vectors.size
+
+    if questions:
+        query_vectors, held_out = encode_questions(questions), set()
+    else:
+        query_vectors, held_out = sample_held_out(client, collection, queries)
+    count = client.count(collection_name=collection, exact=True).count - len(held_out)
+
+    rows = []
+    truth = None
+    for mode in MODES:
+        name = f"{collection}_bench_{mode}"
+        if client.collection_exists(name):
+            client.delete_collection(name)
+        create_search_collection(client, name, vector_size=dim, quantization=mode)
+        copy_collection(client, collection, name, exclude_ids=held_out)
+        wait_until_indexed(client, name)
+
+        if truth is None:
+            # 정답: held-out 을 제외한 동일 데이터(none 복제본)에서의 exact 검색
+            exact = build_search_params(exact=True)
+            truth = [
+                {h.id for h in client.search(collection_name=name, query_vector=q,
+                                             search_params=exact, limit=limit)}
+                for q in query_vectors
+            ]
+
+        params = build_search_params(mode, oversampling=oversampling)
+        latencies = []
+        recalls = []
+        for q, expected in zip(query_vectors, truth):
+            start = time.perf_counter()
+            hits = client.search(collection_name=name, query_vector=q, search_params=params, limit=limit)
+            latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(expected & {h.id for h in hits}) / max(1, len(expected)))
+
+        rows.append({
+            "mode": mode,
+            "recall": float(np.mean(recalls)),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "est_ram_mb": count * dim * RAM_BYTES_PER_DIM[mode] / 1024 ** 2,
+        })
+        if cleanup:
+            client.delete_collection(name)
+
+    source = f"질문 파일 {questions}" if questions else "held-out 저장 벡터"
+    print(f"\n📊 {collection} | {count}건 x {dim}차원 | 질의 {len(query_vectors)}개 ({source}) | limit={limit}")
+    print(f"{'mode':<8}{'recall@' + str(limit):>12}{'p50(ms)':>10}{'p95(ms)':>10}{'벡터 RAM 추정(MB)':>18}")
+    for r in rows:
+        print(f"{r['mode']:<8}{r['recall']:>12.4f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['est_ram_mb']:>18.1f}")
+    print("※ 벡터 RAM 추정: 건수 x 차원 x 바이트 계산값 (측정 아님). 양자화 모드는 원본 float32 on_disk,"
+          " 양자화 벡터만 RAM 상주 기준이며 HNSW 그래프는 제외")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Qdrant 양자화 recall/latency/RAM 벤치마크")
+    parser.add_argument("collection")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=300, help="검색 limit (기본: top_k 30 x 10)")
+    parser.add_argument("--oversampling", type=float, default=None)
+    parser.add_argument("--cleanup", action="store_true", help="벤치마크용 복제 컬렉션 삭제")
+    parser.add_argument("--questions", default=None, help="실제 질문 파일 (한 줄에 하나, KURE-v1 로 인코딩)")
+    args = parser.parse_args()
+    run(args.collection, args.queries, args.limit, args.oversampling, args.cleanup, args.questions)
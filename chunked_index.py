@@ -0,0 +1,223 @@
+"""
+긴 본문 청크 색인 (청크 단위 임베딩 + 부모 문서 단위 점수 집계)
+
+사용법:
+  python chunked_index.py retailtech_test text
+  python chunked_index.py article_2025_image_test content
+
+- 본문을 CHUNK_MAX_TOKENS 토큰 이하 청크로 나눠 배치 임베딩 → <컬렉션>_chunks 에 저장
+- 청크 payload 에 parent_id / parent_collection / chunk_index 와 부모 필터 필드를 복사
+- 본문이 비어 있으면 제목 등 CHUNK_FALLBACK_FIELDS 값으로 대체 청크 1개 저장
+- 재색인 시 부모별 기존 청크를 지우고 다시 저장, 원본에서 사라진 부모의 청크는 마지막에 정리
+- 검색 시 parent_id 로 그룹 검색 후 max 또는 상위 n개 합으로 부모 점수 집계
+"""
+import sys
+import time
+import uuid
+from typing import Callable, Dict, List
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    PointStruct, ScoredPoint, Filter, FieldCondition, MatchAny, FilterSelector, PayloadSchemaType,
+)
+from qdrant_schema import with_fault_path
+
+# ─────────────────────────────────────────────
+# ✅ 설정
+# ─────────────────────────────────────────────
+CHUNK_SUFFIX = "_chunks"
+CHUNK_MAX_TOKENS = 256          # 청크 최대 토큰 수 (KURE-v1 토크나이저 기준)
+CHUNK_OVERLAP_TOKENS = 32       # 청크 경계 문맥 유지를 위한 겹침
+CHUNK_BATCH_SIZE = 64           # 임베딩 배치 크기
+CHUNK_AGGREGATE = "max"         # max | sum (상위 n개 청크 점수 합)
+CHUNK_TOP_N = 3
+# 본문이 비어 있으면 이 필드 중 처음으로 값이 있는 것을 청크 1개로 색인 (청크 검색에서 빠지지 않도록)
+CHUNK_FALLBACK_FIELDS = ("title", "title_original", "fault_path", "store_name")
+
+
+def chunk_collection_name(name: str) -> str:
+    return f"{name}{CHUNK_SUFFIX}"
+
+
+def split_into_chunks(text: str, tokenizer, max_tokens: int = CHUNK_MAX_TOKENS,
+                      overlap: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """토큰 기준 고정 길이 + overlap 슬라이딩 윈도우"""
+    if not text:
+        return []
+    ids = tokenizer.encode(text, add_special_tokens=False)
+    if len(ids) <= max_tokens:
+        return [text]
+
+    step = max(1, max_tokens - overlap)
+    chunks = []
+    for start in range(0, len(ids), step):
+        chunks.append(tokenizer.decode(ids[start:start + max_tokens], skip_special_tokens=True))
+        if start + max_tokens >= len(ids):
+            break
+    return chunks
+
+
+def placeholder_chunk(payload: dict) -> List[str]:
+    """본문이 없는 부모용 대체 청크 (제목 등)"""
+    for field in CHUNK_FALLBACK_FIELDS:
+        if payload.get(field):
+            return [str(payload[field])]
+    return []
+
+
+def chunk_point_id(parent_id, chunk_index: int) -> str:
+    """부모 ID + 청크 번호로 결정적 UUID (재색인 시 같은 청크는 덮어쓰기)"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{parent_id}#{chunk_index}"))
+
+
+def _parent_filter(parent_ids) -> Filter:
+    return Filter(must=[FieldCondition(key="parent_id", match=MatchAny(any=list(parent_ids)))])
+
+
+def create_parent_id_index(client: QdrantClient, target: str, sample_id):
+    """parent_id 페이로드 인덱스 (부모 ID 타입에 맞춰 integer / keyword)"""
+    schema = PayloadSchemaType.INTEGER if isinstance(sample_id, int) else PayloadSchemaType.KEYWORD
+    client.create_payload_index(collection_name=target, field_name="parent_id", field_schema=schema)
+
+
+def prune_orphan_chunks(client: QdrantClient, target: str, live_parent_ids: set, scroll_size: int = 1024):
+    """원본 컬렉션에 없는 부모의 청크 삭제 → 삭제한 부모 수"""
+    orphans = set()
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=target, limit=scroll_size, offset=offset,
+            with_payload=["parent_id"], with_vectors=False,
+        )
+        orphans.update(p.payload["parent_id"] for p in points if p.payload.get("parent_id") not in live_parent_ids)
+        if offset is None:
+            break
+
+    orphans = list(orphans)
+    for s in range(0, len(orphans), scroll_size):
+        client.delete(
+            collection_name=target,
+            points_selector=FilterSelector(filter=_parent_filter(orphans[s:s + scroll_size])),
+        )
+    return len(orphans)
+
+
+# ─────────────────────────────────────────────
+# ✅ 청크 색인
+# ─────────────────────────────────────────────
+def index_chunked(client: QdrantClient, encode: Callable, tokenizer, collection: str, text_field: str,
+                  batch_size: int = CHUNK_BATCH_SIZE, scroll_size: int = 256):
+    """
+    collection 의 text_field 를 청크 단위로 임베딩해 <collection>_chunks 에 저장
+    - 부모별 기존 청크를 parent_id 로 지운 뒤 upsert (본문이 짧아져 청크 수가 줄어도 잔여 청크 없음)
+    - 전체 순회 후 원본에서 삭제된 부모의 청크 정리
+    (청크 컬렉션은 create_search_collection 으로 미리 생성되어 있어야 함)
+    """
+    target = chunk_collection_name(collection)
+    start = time.time()
+    offset = None
+    parents = 0
+    total_chunks = 0
+    live_parent_ids = set()
+
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection, limit=scroll_size, offset=offset,
+            with_payload=True, with_vectors=False,
+        )
+        if points:
+            if not live_parent_ids:
+                create_parent_id_index(client, target, points[0].id)
+            live_parent_ids.update(p.id for p in points)
+            client.delete(
+                collection_name=target,
+                points_selector=FilterSelector(filter=_parent_filter(p.id for p in points)),
+            )
+
+        texts, payloads, ids = [], [], []
+        for p in points:
+            base = with_fault_path({k: v for k, v in p.payload.items() if k != text_field})
+            chunks = split_into_chunks(p.payload.get(text_field) or "", tokenizer) or placeholder_chunk(base)
+            for i, chunk in enumerate(chunks):
+                texts.append(chunk)
+                ids.append(chunk_point_id(p.id, i))
+                payloads.append({
+                    **base,
+                    "parent_id": p.id,
+                    "parent_collection": collection,
+                    "chunk_index": i,
+                    "chunk_text": chunk,
+                })
+
+        for s in range(0, len(texts), batch_size):
+            vectors = encode(texts[s:s + batch_size], batch_size=batch_size)
+            client.upsert(
+                collection_name=target,
+                points=[
+                    PointStruct(id=pid, vector=list(map(float, vec)), payload=payload)
+                    for pid, vec, payload in zip(ids[s:s + batch_size], vectors, payloads[s:s + batch_size])
+                ],
+            )
+
+        parents += len(points)
+        total_chunks += len(texts)
+        print(f"🧩 {collection}: 부모 {parents}건 / 청크 {total_chunks}개 ({time.time() - start:.1f}초)")
+        if offset is None:
+            break
+
+    pruned = prune_orphan_chunks(client, target, live_parent_ids)
+    print(f"✅ 청크 색인 완료: {collection} → {target} (삭제된 부모 {pruned}건 청크 정리)")
+    return total_chunks
+
+
+# ─────────────────────────────────────────────
+# ✅ 청크 그룹 → 부모 문서 점수 집계
+# ─────────────────────────────────────────────
+def aggregate_chunk_groups(groups, aggregate: str = CHUNK_AGGREGATE, top_n: int = CHUNK_TOP_N) -> List[dict]:
+    """
+    parent_id 로 묶인 청크 그룹 → 부모별 점수
+    max: 가장 유사한 청크 점수 / sum: 상위 top_n 청크 점수 합
+    """
+    parents = []
+    for g in groups:
+        hits = sorted(g.hits, key=lambda h: h.score, reverse=True)
+        score = hits[0].score if aggregate == "max" else sum(h.score for h in hits[:top_n])
+        parents.append({
+            "parent_id": g.id,
+            "parent_collection": hits[0].payload.get("parent_collection"),
+            "score": float(score),
+            "best_chunk": hits[0].payload.get("chunk_text", ""),
+        })
+    parents.sort(key=lambda p: p["score"], reverse=True)
+    return parents
+
+
+def fetch_parent_points(client: QdrantClient, parents: List[dict]) -> List[ScoredPoint]:
+    """집계된 부모 문서 payload 조회 → 기존 검색 결과와 같은 ScoredPoint 형태"""
+    by_collection: Dict[str, list] = {}
+    for p in parents:
+        by_collection.setdefault(p["parent_collection"], []).append(p["parent_id"])
+
+    payloads = {}
+    for name, ids in by_collection.items():
+        for record in client.retrieve(collection_name=name, ids=ids, with_payload=True):
+            payloads[record.id] = record.payload
+
+    return [
+        ScoredPoint(id=p["parent_id"], version=0, score=p["score"], payload=payloads[p["parent_id"]])
+        for p in parents
+        if p["parent_id"] in payloads
+    ]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("사용법: python chunked_index.py <컬렉션> <본문 필드>")
+        sys.exit(1)
+
+    from sentence_transformers import SentenceTransformer
+    from qdrant_schema import create_search_collection
+
+    model = SentenceTransformer("nlpai-lab/KURE-v1", device="cpu")
+    qdrant = QdrantClient(host="localhost", port=6333)
+    create_search_collection(qdrant, chunk_collection_name(sys.argv[1]))
+    index_chunked(qdrant, model.encode, model.tokenizer, sys.argv[1], sys.argv[2])
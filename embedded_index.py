@@ -0,0 +1,509 @@
+import os
+import sys
+import json
+import random
+import time
+import numpy as np
+from pathlib import Path
+from typing import List, Dict, Optional
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    Filter, FieldCondition, MatchValue, MatchAny, MatchText, Range,
+    ScoredPoint,
+)
+from qdrant_client.http.models import (
+    QueryResponse, CollectionsResponse, CollectionDescription, GroupsResult, PointGroup, Record,
+)
+
+# ─────────────────────────────────────────────
+# ✅ 백엔드 설정 (qdrant | embedded)
+# ─────────────────────────────────────────────
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "qdrant")
+EMBEDDED_INDEX_DIR = os.environ.get("EMBEDDED_INDEX_DIR", "embedded_index")
+
+# ✅ 컬럼으로 저장할 필터 필드 (qdrant_utils + qdrant_multi 공통)
+DEFAULT_FILTER_FIELDS = [
+    "year", "month", "day", "keywords", "store_code", "store_name", "sFileName",
+    "fault_major", "fault_mid", "fault_minor", "fault_path", "parent_id",
+    "date_day", "date_weekday", "title_original", "organization", "reporter", "topic",
+]
+
+SCORE_BLOCK_ROWS = 65536      # 한 번에 메모리로 읽어 점수 계산할 벡터 행 수
+MISSING_INT = np.iinfo(np.int32).min
+MISSING_CODE = -1
+
+
+def create_client(host: str = "localhost", port: int = 6333):
+    """VECTOR_BACKEND 값에 따라 Qdrant 서버 클라이언트 또는 임베디드 클라이언트 반환"""
+    if VECTOR_BACKEND == "embedded":
+        print(f"📦 임베디드 벡터 인덱스 사용: {EMBEDDED_INDEX_DIR}")
+        return EmbeddedClient(EMBEDDED_INDEX_DIR)
+    return QdrantClient(host=host, port=port)
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+# ─────────────────────────────────────────────
+# ✅ 단일 컬렉션 인덱스 (mmap float16 벡터 + 컬럼형 페이로드)
+# ─────────────────────────────────────────────
+class EmbeddedIndex:
+    """
+    디렉토리 구조
+      meta.json                 : 차원, 건수, 필드 타입
+      ids.json                  : 포인트 ID 목록
+      vectors.npy               : 정규화된 float16 벡터 (mmap)
+      payloads.jsonl            : 페이로드 원본 (상위 결과만 오프셋으로 읽음)
+      payload_offsets.npy       : payloads.jsonl 줄 시작 오프셋
+      col_<field>.npy           : int 필드 값 / str 필드 코드
+      vocab_<field>.json        : str / list 필드 어휘
+      csr_<field>_indptr.npy    : list 필드 행별 구간
+      csr_<field>_indices.npy   : list 필드 어휘 코드
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "meta.json", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(self.path / "ids.json", encoding="utf-8") as f:
+            self.ids = json.load(f)
+
+        self.count = self.meta["count"]
+        self.field_types: Dict[str, str] = self.meta["fields"]
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        self.payload_offsets = np.load(self.path / "payload_offsets.npy", mmap_mode="r")
+        self._payload_fd = os.open(self.path / "payloads.jsonl", os.O_RDONLY)
+        self.row_of = {pid: row for row, pid in enumerate(self.ids)}
+
+        self.columns = {}
+        self.vocabs = {}
+        self.vocab_lookup = {}
+        for field, kind in self.field_types.items():
+            if kind == "list":
+                indptr = np.load(self.path / f"csr_{field}_indptr.npy", mmap_mode="r")
+                indices = np.load(self.path / f"csr_{field}_indices.npy", mmap_mode="r")
+                rows = np.repeat(np.arange(self.count, dtype=np.int32), np.diff(indptr))
+                self.columns[field] = (indices, rows)
+            else:
+                self.columns[field] = np.load(self.path / f"col_{field}.npy", mmap_mode="r")
+            if kind in ("str", "list"):
+                with open(self.path / f"vocab_{field}.json", encoding="utf-8") as f:
+                    self.vocabs[field] = json.load(f)
+                self.vocab_lookup[field] = {v: i for i, v in enumerate(self.vocabs[field])}
+
+    # ── 필터 평가 ─────────────────────────────
+    def _codes_mask(self, field: str, codes) -> np.ndarray:
+        """어휘 코드 집합에 해당하는 행 마스크"""
+        mask = np.zeros(self.count, dtype=bool)
+        codes = np.asarray(sorted(codes), dtype=np.int32)
+        if codes.size == 0:
+            return mask
+        if self.field_types[field] == "list":
+            indices, rows = self.columns[field]
+            mask[rows[np.isin(indices, codes)]] = True
+        else:
+            mask[np.isin(self.columns[field], codes)] = True
+        return mask
+
+    def _eval_condition(self, cond: FieldCondition) -> np.ndarray:
+        field = cond.key
+        kind = self.field_types.get(field)
+        if kind is None:
+            # 컬럼으로 저장되지 않은 필드 → 매칭 없음
+            return np.zeros(self.count, dtype=bool)
+
+        if cond.range is not None:
+            if kind != "int":
+                return np.zeros(self.count, dtype=bool)
+            col = self.columns[field]
+            mask = col != MISSING_INT
+            r: Range = cond.range
+            if r.gt is not None: mask &= col > r.gt
+            if r.gte is not None: mask &= col >= r.gte
+            if r.lt is not None: mask &= col < r.lt
+            if r.lte is not None: mask &= col <= r.lte
+            return mask
+
+        match = cond.match
+        if isinstance(match, MatchValue):
+            values = [match.value]
+        elif isinstance(match, MatchAny):
+            values = list(match.any)
+        elif isinstance(match, MatchText):
+            if kind == "int":
+                return np.zeros(self.count, dtype=bool)
+            codes = [i for i, v in enumerate(self.vocabs[field]) if match.text in v]
+            return self._codes_mask(field, codes)
+        else:
+            raise ValueError(f"지원하지 않는 match 조건: {type(match).__name__}")
+
+        if kind == "int":
+            ints = [v for v in values if isinstance(v, int) and not isinstance(v, bool)]
+            return np.isin(self.columns[field], np.asarray(ints, dtype=np.int32))
+
+        lookup = self.vocab_lookup[field]
+        codes = [lookup[v] for v in values if isinstance(v, str) and v in lookup]
+        return self._codes_mask(field, codes)
+
+    def _eval(self, cond) -> np.ndarray:
+        if isinstance(cond, Filter):
+            return self.eval_filter(cond)
+        if isinstance(cond, FieldCondition):
+            return self._eval_condition(cond)
+        raise ValueError(f"지원하지 않는 필터 조건: {type(cond).__name__}")
+
+    def eval_filter(self, flt: Optional[Filter]) -> Optional[np.ndarray]:
+        """Qdrant Filter → 행 마스크 (필터 없으면 None)"""
+        if flt is None:
+            return None
+        mask = np.ones(self.count, dtype=bool)
+        for cond in _as_list(flt.must):
+            mask &= self._eval(cond)
+        should = _as_list(flt.should)
+        if should:
+            any_mask = np.zeros(self.count, dtype=bool)
+            for cond in should:
+                any_mask |= self._eval(cond)
+            mask &= any_mask
+        for cond in _as_list(flt.must_not):
+            mask &= ~self._eval(cond)
+        return mask
+
+    # ── 페이로드 / 결과 변환 ───────────────────
+    def payload(self, row: int) -> dict:
+        start = int(self.payload_offsets[row])
+        end = int(self.payload_offsets[row + 1])
+        return json.loads(os.pread(self._payload_fd, end - start, start))
+
+    def _select_payload(self, row: int, with_payload):
+        """with_payload: True / False / 필드명 리스트 (Qdrant 와 동일)"""
+        if not with_payload:
+            return None
+        payload = self.payload(row)
+        if isinstance(with_payload, list):
+            return {k: payload[k] for k in with_payload if k in payload}
+        return payload
+
+    def _to_point(self, row: int, score: float, with_payload=True, with_vectors=False) -> ScoredPoint:
+        return ScoredPoint(
+            id=self.ids[row],
+            version=0,
+            score=float(score),
+            payload=self._select_payload(row, with_payload),
+            vector=self.vectors[row].astype(np.float32).tolist() if with_vectors else None,
+        )
+
+    # ── 검색 ──────────────────────────────────
+    def top_k(self, query_vector, mask: Optional[np.ndarray], limit: int,
+              score_threshold: Optional[float] = None):
+        """블록 단위 벡터화 점수 계산 → (행 번호, 점수) 상위 limit개"""
+        q = np.asarray(query_vector, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+
+        rows = None if mask is None else np.flatnonzero(mask)
+        total = self.count if rows is None else rows.size
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+
+        for start in range(0, total, SCORE_BLOCK_ROWS):
+            if rows is None:
+                block_rows = np.arange(start, min(start + SCORE_BLOCK_ROWS, total))
+                block = self.vectors[start:start + SCORE_BLOCK_ROWS]
+            else:
+                block_rows = rows[start:start + SCORE_BLOCK_ROWS]
+                block = self.vectors[block_rows]
+            scores = block.astype(np.float32) @ q
+
+            best_rows = np.concatenate([best_rows, block_rows])
+            best_scores = np.concatenate([best_scores, scores])
+            if best_scores.size > limit:
+                keep = np.argpartition(-best_scores, limit - 1)[:limit]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+
+        order = np.argsort(-best_scores, kind="stable")
+        best_rows, best_scores = best_rows[order], best_scores[order]
+        if score_threshold is not None:
+            keep = best_scores >= score_threshold
+            best_rows, best_scores = best_rows[keep], best_scores[keep]
+        return best_rows, best_scores
+
+    def search(self, query_vector, query_filter=None, limit=10, with_payload=True,
+               with_vectors=False, score_threshold=None) -> List[ScoredPoint]:
+        rows, scores = self.top_k(query_vector, self.eval_filter(query_filter), limit, score_threshold)
+        return [self._to_point(r, s, with_payload, with_vectors) for r, s in zip(rows, scores)]
+
+    def search_groups(self, query_vector, group_by: str, query_filter=None, limit=10, group_size=1,
+                      with_payload=True, score_threshold=None) -> List[PointGroup]:
+        """
+        group_by 필드(str / int 컬럼) 값별 상위 group_size 건
+        - 후보 수는 상위 limit 개 그룹이 모일 때까지만 2배씩 증가
+        - 덜 찬 그룹은 해당 그룹 행으로 제한한 top_k 로 채움 → 작은 그룹 때문에 전체를 다시 훑지 않음
+        (페이로드는 최종 결과만 읽음)
+        """
+        kind = self.field_types.get(group_by)
+        if kind not in ("str", "int"):
+            raise ValueError(f"그룹 검색은 str / int 컬럼 필드만 지원: {group_by}")
+
+        codes = self.columns[group_by]
+        missing = MISSING_CODE if kind == "str" else MISSING_INT
+        group_id = (lambda code: self.vocabs[group_by][code]) if kind == "str" else (lambda code: code)
+        mask = self.eval_filter(query_filter)
+        total = self.count if mask is None else int(mask.sum())
+        candidates = limit * group_size * 4
+
+        while True:
+            rows, scores = self.top_k(query_vector, mask, candidates, score_threshold)
+            exhausted = len(rows) < candidates or candidates >= total
+            groups: Dict[int, list] = {}
+            for r, s in zip(rows, scores):
+                code = int(codes[r])
+                if code == missing:
+                    continue
+                hits = groups.setdefault(code, [])
+                if len(hits) < group_size:
+                    hits.append((r, s))
+            if len(groups) >= limit or exhausted:
+                break
+            candidates *= 2
+
+        top_groups = list(groups.items())[:limit]
+        if not exhausted:
+            for code, hits in top_groups:
+                if len(hits) < group_size:
+                    group_mask = codes == code if mask is None else mask & (codes == code)
+                    group_rows, group_scores = self.top_k(query_vector, group_mask, group_size, score_threshold)
+                    hits[:] = list(zip(group_rows, group_scores))
+
+        return [
+            PointGroup(id=group_id(code), hits=[self._to_point(r, s, with_payload) for r, s in hits])
+            for code, hits in top_groups
+        ]
+
+    def scroll_filtered(self, query_filter=None, limit=10, with_payload=True,
+                        with_vectors=False) -> List[ScoredPoint]:
+        mask = self.eval_filter(query_filter)
+        rows = np.arange(min(limit, self.count)) if mask is None else np.flatnonzero(mask)[:limit]
+        return [self._to_point(r, 0.0, with_payload, with_vectors) for r in rows]
+
+
+# ─────────────────────────────────────────────
+# ✅ QdrantClient 호환 클라이언트 (검색 관련 메서드만)
+# ─────────────────────────────────────────────
+class EmbeddedClient:
+    def __init__(self, root: str = EMBEDDED_INDEX_DIR):
+        self.root = Path(root)
+        self._indexes: Dict[str, EmbeddedIndex] = {}
+
+    def index(self, collection_name: str) -> EmbeddedIndex:
+        if collection_name not in self._indexes:
+            self._indexes[collection_name] = EmbeddedIndex(self.root / collection_name)
+        return self._indexes[collection_name]
+
+    def get_collections(self) -> CollectionsResponse:
+        names = sorted(p.name for p in self.root.iterdir() if (p / "meta.json").exists()) if self.root.exists() else []
+        return CollectionsResponse(collections=[CollectionDescription(name=n) for n in names])
+
+    def collection_exists(self, collection_name: str) -> bool:
+        return (self.root / collection_name / "meta.json").exists()
+
+    def search(self, collection_name, query_vector, query_filter=None, limit=10,
+               with_payload=True, with_vectors=False, score_threshold=None, **kwargs):
+        return self.index(collection_name).search(
+            query_vector, query_filter, limit, with_payload, with_vectors, score_threshold
+        )
+
+    def retrieve(self, collection_name, ids, with_payload=True, with_vectors=False, **kwargs) -> List[Record]:
+        idx = self.index(collection_name)
+        rows = [idx.row_of[pid] for pid in ids if pid in idx.row_of]
+        return [
+            Record(
+                id=idx.ids[r],
+                payload=idx.payload(r) if with_payload else None,
+                vector=idx.vectors[r].astype(np.float32).tolist() if with_vectors else None,
+            )
+            for r in rows
+        ]
+
+    def query_points_groups(self, collection_name, group_by, query=None, query_filter=None, limit=10,
+                            group_size=3, with_payload=True, score_threshold=None, **kwargs):
+        groups = self.index(collection_name).search_groups(
+            query, group_by, query_filter, limit, group_size, with_payload, score_threshold
+        )
+        return GroupsResult(groups=groups)
+
+    def query_points(self, collection_name, query=None, query_filter=None, limit=10,
+                     with_payload=True, with_vectors=False, score_threshold=None, **kwargs):
+        idx = self.index(collection_name)
+        if query is None:
+            points = idx.scroll_filtered(query_filter, limit, with_payload, with_vectors)
+        else:
+            points = idx.search(query, query_filter, limit, with_payload, with_vectors, score_threshold)
+        return QueryResponse(points=points)
+
+
+# ─────────────────────────────────────────────
+# ✅ Qdrant 컬렉션 → 임베디드 인덱스 내보내기
+# ─────────────────────────────────────────────
+def _infer_field_type(values) -> str:
+    present = [v for v in values if v is not None]
+    if any(isinstance(v, list) for v in present):
+        return "list"
+    if present and all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return "int"
+    return "str"
+
+
+def _write_columns(path: Path, fields: List[str], field_values: Dict[str, list]) -> Dict[str, str]:
+    field_types = {}
+    for field in fields:
+        values = field_values[field]
+        kind = _infer_field_type(values)
+        field_types[field] = kind
+
+        if kind == "int":
+            col = np.array([MISSING_INT if v is None else v for v in values], dtype=np.int32)
+            np.save(path / f"col_{field}.npy", col)
+            continue
+
+        vocab: Dict[str, int] = {}
+        if kind == "str":
+            codes = np.array(
+                [MISSING_CODE if v is None else vocab.setdefault(str(v), len(vocab)) for v in values],
+                dtype=np.int32,
+            )
+            np.save(path / f"col_{field}.npy", codes)
+        else:
+            indptr = [0]
+            indices = []
+            for v in values:
+                items = v if isinstance(v, list) else ([] if v is None else [v])
+                indices.extend(vocab.setdefault(str(item), len(vocab)) for item in items)
+                indptr.append(len(indices))
+            np.save(path / f"csr_{field}_indptr.npy", np.array(indptr, dtype=np.int64))
+            np.save(path / f"csr_{field}_indices.npy", np.array(indices, dtype=np.int32))
+
+        with open(path / f"vocab_{field}.json", "w", encoding="utf-8") as f:
+            json.dump(list(vocab), f, ensure_ascii=False)
+    return field_types
+
+
+def export_collection(client: QdrantClient, collection_name: str, root: str = EMBEDDED_INDEX_DIR,
+                      fields: List[str] = None, batch_size: int = 512) -> Path:
+    """Qdrant 컬렉션을 scroll 하며 벡터를 float16 mmap 파일로 바로 기록"""
+    fields = fields or DEFAULT_FILTER_FIELDS
+    path = Path(root) / collection_name
+    path.mkdir(parents=True, exist_ok=True)
+
+    count = client.count(collection_name=collection_name, exact=True).count
+    dim = client.get_collection(collection_name).config.params.vectors.size
+    vectors = np.lib.format.open_memmap(path / "vectors.npy", mode="w+", dtype=np.float16, shape=(count, dim))
+
+    ids = []
+    offsets = [0]
+    field_values = {f: [] for f in fields}
+    offset = None
+    start = time.time()
+
+    with open(path / "payloads.jsonl", "wb") as payload_file:
+        while len(ids) < count:
+            points, offset = client.scroll(
+                collection_name=collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            if not points:
+                break
+
+            points = points[:count - len(ids)]
+            batch = np.asarray([p.vector for p in points], dtype=np.float32)
+            norms = np.linalg.norm(batch, axis=1, keepdims=True)
+            vectors[len(ids):len(ids) + len(points)] = (batch / np.where(norms == 0, 1.0, norms)).astype(np.float16)
+
+            for p in points:
+                ids.append(p.id)
+                line = (json.dumps(p.payload, ensure_ascii=False) + "\n").encode("utf-8")
+                payload_file.write(line)
+                offsets.append(offsets[-1] + len(line))
+                for f in fields:
+                    field_values[f].append(p.payload.get(f))
+
+            if offset is None:
+                break
+
+    vectors.flush()
+    del vectors
+    np.save(path / "payload_offsets.npy", np.array(offsets, dtype=np.int64))
+    with open(path / "ids.json", "w", encoding="utf-8") as f:
+        json.dump(ids, f)
+
+    field_types = _write_columns(path, fields, field_values)
+    with open(path / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"count": len(ids), "dim": dim, "fields": field_types}, f, ensure_ascii=False)
+
+    print(f"✅ 내보내기 완료: {collection_name} {len(ids)}건 → {path} ({time.time() - start:.1f}초)")
+    return path
+
+
+# ─────────────────────────────────────────────
+# ✅ Qdrant 결과와 정합성 비교
+# ─────────────────────────────────────────────
+def check_parity(client: QdrantClient, collection_name: str, root: str = EMBEDDED_INDEX_DIR,
+                 samples: int = 20, top_k: int = 10, seed: int = 0) -> dict:
+    """
+    저장된 벡터 중 일부를 질의로 사용해 Qdrant / 임베디드 top-k 비교
+    (필터 없음 + 질의 문서의 연도 필터 두 가지)
+    """
+    idx = EmbeddedIndex(Path(root) / collection_name)
+    rng = random.Random(seed)
+    rows = rng.sample(range(idx.count), min(samples, idx.count))
+
+    overlaps = []
+    max_score_diff = 0.0
+    for row in rows:
+        query_vector = idx.vectors[row].astype(np.float32)
+        filters = [None]
+        year = idx.payload(row).get("year")
+        if year is not None:
+            filters.append(Filter(must=[FieldCondition(key="year", match=MatchValue(value=year))]))
+
+        for flt in filters:
+            expected = client.query_points(collection_name=collection_name, query=query_vector.tolist(),
+                                           query_filter=flt, limit=top_k, with_payload=False).points
+            actual = idx.search(query_vector, flt, top_k, with_payload=False)
+
+            expected_ids = [h.id for h in expected]
+            actual_ids = [h.id for h in actual]
+            overlaps.append(len(set(expected_ids) & set(actual_ids)) / max(1, len(expected_ids)))
+
+            expected_scores = {h.id: h.score for h in expected}
+            for h in actual:
+                if h.id in expected_scores:
+                    max_score_diff = max(max_score_diff, abs(expected_scores[h.id] - h.score))
+
+    report = {
+        "queries": len(overlaps),
+        "mean_overlap": round(float(np.mean(overlaps)), 4) if overlaps else 0.0,
+        "min_overlap": round(float(np.min(overlaps)), 4) if overlaps else 0.0,
+        "max_score_diff": round(max_score_diff, 5),
+    }
+    print(f"🔍 정합성 결과 [{collection_name}]: {report}")
+    return report
+
+
+if __name__ == "__main__":
+    # 사용법: python embedded_index.py export|parity <collection_name>
+    if len(sys.argv) != 3 or sys.argv[1] not in ("export", "parity"):
+        print("사용법: python embedded_index.py export|parity <collection_name>")
+        sys.exit(1)
+
+    qdrant = QdrantClient(host="localhost", port=6333)
+    if sys.argv[1] == "export":
+        export_collection(qdrant, sys.argv[2])
+    else:
+        report = check_parity(qdrant, sys.argv[2])
+        sys.exit(0 if report["min_overlap"] >= 0.9 else 1)
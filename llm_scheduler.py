@@ -0,0 +1,191 @@
+import asyncio
+import functools
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Optional
+
+# ─────────────────────────────────────────────
+# ✅ 우선순위 레인 (숫자가 작을수록 먼저 처리)
+# ─────────────────────────────────────────────
+LANE_PRIORITY = {
+    "search": 0,     # 검색 키워드 생성 (모든 검색의 임계 경로)
+    "summary": 1,    # 사용자 요약 요청
+}
+
+
+class LLMOverloaded(Exception):
+    """LLM 대기열 과부하 (→ 503 / 축소 응답)"""
+
+
+class LLMQueueFull(LLMOverloaded):
+    """레인 대기열이 가득 차 요청을 즉시 거절"""
+
+    def __init__(self, lane: str, pending: int):
+        super().__init__(f"LLM 대기열 가득 참 (lane={lane}, 대기 {pending}건)")
+        self.lane = lane
+        self.pending = pending
+
+
+class LLMQueueTimeout(LLMOverloaded):
+    """LLM 대기열에서 허용 시간 내에 실행 슬롯을 얻지 못함"""
+
+    def __init__(self, lane: str, waited: float):
+        super().__init__(f"LLM 대기열 시간 초과 (lane={lane}, 대기 {waited:.2f}초)")
+        self.lane = lane
+        self.waited = waited
+
+
+class LLMScheduler:
+    """
+    프로세스 내 LLM 호출 스케줄러
+    - 동시 실행 수 제한 (max_concurrency)
+    - 레인 우선순위: 슬롯이 비면 search 레인 대기자가 summary 보다 먼저 실행
+    - 레인별 대기 시간 제한: 초과 시 LLMQueueTimeout
+    - 레인별 최대 대기 건수: 초과 시 submit() 에서 즉시 LLMQueueFull
+    - 동일 요청(key) 실행 중이면 새로 호출하지 않고 기존 결과를 공유
+    - 레인마다 전용 스레드풀 → 대기 중인 요청이 웹 서버 공용 스레드풀을 점유하지 않음
+    """
+
+    def __init__(self, max_concurrency: int = 4, queue_timeouts: Optional[Dict[str, float]] = None,
+                 max_queue_depth: Optional[Dict[str, int]] = None):
+        self.max_concurrency = max_concurrency
+        self.queue_timeouts = queue_timeouts or {}
+        self.max_queue_depth = max_queue_depth or {}
+        self._pending = {lane: 0 for lane in LANE_PRIORITY}
+        self._executors = {
+            lane: ThreadPoolExecutor(max_workers=self.max_pending(lane), thread_name_prefix=f"llm-{lane}")
+            for lane in LANE_PRIORITY
+        }
+        self._cond = threading.Condition()
+        self._waiting = []                      # heap: (priority, seq, lane)
+        self._active = 0
+        self._inflight: Dict[Hashable, Future] = {}
+        self._seq = itertools.count()
+        self._stats = {
+            lane: {"submitted": 0, "completed": 0, "rejected": 0, "deduped": 0,
+                   "wait_ms": deque(maxlen=500)}
+            for lane in LANE_PRIORITY
+        }
+
+    def max_pending(self, lane: str) -> int:
+        """레인에서 동시에 받아둘 수 있는 요청 수 (실행 + 대기)"""
+        return self.max_concurrency + self.max_queue_depth.get(lane, 4 * self.max_concurrency)
+
+    # ── 수용 제어 (이벤트 루프에서 호출) ─────────
+    async def submit(self, lane: str, fn: Callable, *args, **kwargs):
+        """
+        레인 수용 한도를 넘으면 즉시 LLMQueueFull, 아니면 레인 전용 스레드풀에서 fn 실행
+        (fn 내부의 call_vllm → run() 에서 우선순위 대기)
+        """
+        with self._cond:
+            if self._pending[lane] >= self.max_pending(lane):
+                self._stats[lane]["rejected"] += 1
+                raise LLMQueueFull(lane, self._pending[lane])
+            self._pending[lane] += 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executors[lane], functools.partial(fn, *args, **kwargs))
+        finally:
+            with self._cond:
+                self._pending[lane] -= 1
+
+    # ── 슬롯 획득 / 반환 ──────────────────────
+    def _acquire(self, lane: str):
+        entry = (LANE_PRIORITY[lane], next(self._seq), lane)
+        timeout = self.queue_timeouts.get(lane)
+        start = time.monotonic()
+
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            while self._active >= self.max_concurrency or self._waiting[0] != entry:
+                remaining = None if timeout is None else timeout - (time.monotonic() - start)
+                if remaining is not None and remaining <= 0:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._stats[lane]["rejected"] += 1
+                    self._cond.notify_all()
+                    raise LLMQueueTimeout(lane, time.monotonic() - start)
+                self._cond.wait(remaining)
+
+            heapq.heappop(self._waiting)
+            self._active += 1
+            self._stats[lane]["wait_ms"].append((time.monotonic() - start) * 1000)
+            self._cond.notify_all()
+
+    def _release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    # ── 실행 ──────────────────────────────────
+    def run(self, key: Hashable, fn: Callable, lane: str = "summary"):
+        """fn() 을 lane 우선순위로 실행. 같은 key 가 실행 중이면 그 결과를 기다려 반환"""
+        with self._cond:
+            self._stats[lane]["submitted"] += 1
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self._stats[lane]["deduped"] += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            self._acquire(lane)
+        except LLMQueueTimeout as e:
+            with self._cond:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._cond:
+                self._inflight.pop(key, None)
+                self._stats[lane]["completed"] += 1
+            self._release()
+
+    # ── 모니터링 ──────────────────────────────
+    def stats(self) -> dict:
+        with self._cond:
+            depth = {lane: 0 for lane in LANE_PRIORITY}
+            for _, _, lane in self._waiting:
+                depth[lane] += 1
+
+            lanes = {}
+            for lane, s in self._stats.items():
+                waits = sorted(s["wait_ms"])
+                lanes[lane] = {
+                    "queue_depth": depth[lane],
+                    "pending": self._pending[lane],
+                    "max_pending": self.max_pending(lane),
+                    "submitted": s["submitted"],
+                    "completed": s["completed"],
+                    "rejected": s["rejected"],
+                    "deduped": s["deduped"],
+                    "wait_ms_p50": round(waits[len(waits) // 2], 2) if waits else 0.0,
+                    "wait_ms_p95": round(waits[int(len(waits) * 0.95)], 2) if waits else 0.0,
+                    "wait_ms_max": round(waits[-1], 2) if waits else 0.0,
+                    "queue_timeout_s": self.queue_timeouts.get(lane),
+                }
+
+            return {
+                "max_concurrency": self.max_concurrency,
+                "active": self._active,
+                "inflight_keys": len(self._inflight),
+                "lanes": lanes,
+            }
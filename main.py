@@ -1,12 +1,16 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from qdrant_utils import keyword_then_semantic_rerank
+from qdrant_utils import keyword_then_semantic_rerank, GROUP_BY_FIELDS
+from similar_graph import SimilarGraph, GROUP_MODES, SIMILAR_TOP_K
 from vllm_utils import (
     call_vllm_generate_search_condition,
     clean_llm_keywords,
-    call_vllm_summarize_article
+    summarize_with_stats,
+    llm_scheduler,
+    LLMOverloaded
 )
 import json
 from datetime import datetime
@@ -20,6 +24,12 @@ app = FastAPI()
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
+# ✅ 그룹 검색 시 그룹당 최대 접수건 수
+MAX_GROUP_SIZE = 5
+
+# ✅ 유사 장애 그래프 (python similar_graph.py build 로 사전 생성)
+similar_graph = SimilarGraph()
+
 # ─────────────────────────────────────────────
 # ✅ 로그 디렉토리 및 파일 설정
 # ─────────────────────────────────────────────
@@ -48,21 +58,40 @@ async def serve_home(request: Request):
 async def document_search(request: Request):
     data = await request.json()
     user_question = data.get("question")
+    group_by = data.get("group_by")            # "store" | "fault" → 중복 접수건 묶기
+    group_size = 1
 
     if not user_question:
         return {"error": "❌ 질문이 없습니다."}
+    if group_by:
+        if group_by not in GROUP_BY_FIELDS:
+            return {"error": f"❌ group_by 는 {list(GROUP_BY_FIELDS)} 중 하나여야 합니다."}
+        try:
+            group_size = int(data.get("group_size", 3))
+        except (TypeError, ValueError):
+            group_size = 0
+        if not 1 <= group_size <= MAX_GROUP_SIZE:
+            return {"error": f"❌ group_size 는 1~{MAX_GROUP_SIZE} 사이의 정수여야 합니다."}
 
     print(f"\n📥 사용자 질문: {user_question}")
 
-    # ✅ 1단계: LLM 키워드 생성
-    raw_keywords = call_vllm_generate_search_condition(user_question)
-    print(f"🔍 LLM 생성 키워드 (원본): {raw_keywords}")
-
-    keywords = clean_llm_keywords(raw_keywords)
+    # ✅ 1단계: LLM 키워드 생성 (대기열 초과 시 키워드 없이 의미검색으로 축소)
+    degraded = False
+    try:
+        raw_keywords = await llm_scheduler.submit("search", call_vllm_generate_search_condition, user_question)
+        print(f"🔍 LLM 생성 키워드 (원본): {raw_keywords}")
+        keywords = clean_llm_keywords(raw_keywords)
+    except LLMOverloaded as e:
+        print(f"⚠️ {e} → 키워드 없이 의미검색 진행")
+        keywords = []
+        degraded = True
     print(f"✅ 정제된 키워드 리스트: {keywords}")
 
     # ✅ 2단계: Qdrant 검색 수행
-    document_list = keyword_then_semantic_rerank(user_question, keywords, top_k=30)
+    document_list = await run_in_threadpool(
+        keyword_then_semantic_rerank, user_question, keywords,
+        top_k=30, group_by=group_by, group_size=group_size
+    )
     print(f"\n📄 검색 결과 개수: {len(document_list)}")
 
     # ✅ 3단계: RetailTech 형식으로 정리
@@ -86,7 +115,8 @@ async def document_search(request: Request):
             "ocs_cause_minor": doc.get("ocs_cause_minor", ""),
             "keywords": doc.get("keywords", ""),
             "score": round(doc.get("score", 0.0), 5),
-            "accuracy": f"{round(doc.get('score', 0.0) * 100, 2)}%"
+            "accuracy": f"{round(doc.get('score', 0.0) * 100, 2)}%",
+            **({"group_key": doc.get("group_key"), "duplicates": doc.get("duplicates", [])} if group_by else {})
         })
 
     # ✅ 로그 기록 (질문 + 키워드 + 검색 결과)
@@ -94,16 +124,45 @@ async def document_search(request: Request):
         "event": "search",
         "question": user_question,
         "llm_keywords": keywords,
+        "group_by": group_by,
+        "degraded": degraded,
         "result_count": len(formatted_documents),
         "top3_preview": formatted_documents[:3]
     })
 
     return {
         "result_count": len(formatted_documents),
+        "degraded": degraded,
         "documents": formatted_documents
     }
 
 
+# ─────────────────────────────────────────────
+# ✅ 유사 장애 조회 API (사전 계산된 이웃 테이블)
+# ─────────────────────────────────────────────
+@app.get("/documents/{record_id}/similar")
+async def similar_documents(record_id: str, mode: str = "all", limit: int = 10):
+    if mode not in GROUP_MODES:
+        return JSONResponse(status_code=400, content={"error": f"❌ mode 는 {list(GROUP_MODES)} 중 하나여야 합니다."})
+    if not 1 <= limit <= SIMILAR_TOP_K:
+        return JSONResponse(status_code=400, content={"error": f"❌ limit 은 1~{SIMILAR_TOP_K} 사이여야 합니다."})
+
+    try:
+        documents = similar_graph.similar(record_id, mode=mode, limit=limit)
+    except FileNotFoundError:
+        return JSONResponse(status_code=503, content={"error": "❌ 유사 장애 그래프가 아직 생성되지 않았습니다."})
+
+    if documents is None:
+        return JSONResponse(status_code=404, content={"error": f"❌ 접수번호 {record_id} 를 찾을 수 없습니다."})
+
+    return {
+        "record_id": record_id,
+        "mode": mode,
+        "result_count": len(documents),
+        "documents": documents
+    }
+
+
 # ─────────────────────────────────────────────
 # ✅ 요약 API (스토리로그 포함)
 # ─────────────────────────────────────────────
@@ -117,7 +176,11 @@ async def summarize_article(request: Request):
     if not data.get("content"):
         return {"error": "❌ 요약할 본문이 없습니다."}
 
-    summary = call_vllm_summarize_article(data)
+    try:
+        summary, prompt_stats = await llm_scheduler.submit("summary", summarize_with_stats, data)
+    except LLMOverloaded as e:
+        print(f"⚠️ {e}")
+        return JSONResponse(status_code=503, content={"error": "⏳ 요약 요청이 많습니다. 잠시 후 다시 시도해주세요."})
 
     # ✅ 요약 결과 로그 저장
     log_to_file({
@@ -128,7 +191,16 @@ async def summarize_article(request: Request):
         "ocs_cause_major": data.get("ocs_cause_major"),
         "urgency": data.get("urgency"),
         "input_excerpt": data.get("content")[:200],
-        "summary": summary
+        "summary": summary,
+        **prompt_stats
     })
 
     return {"summary": summary}
+
+
+# ─────────────────────────────────────────────
+# ✅ LLM 스케줄러 모니터링 (대기열 깊이 / 대기 시간)
+# ─────────────────────────────────────────────
+@app.get("/metrics/llm")
+async def llm_metrics():
+    return llm_scheduler.stats()
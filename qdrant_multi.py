@@ -1,14 +1,20 @@
+import os
 import time
 from typing import List
-from qdrant_client import QdrantClient
-from qdrant_client.models import Filter, FieldCondition, MatchValue
+from qdrant_client.models import Filter, FieldCondition, MatchValue, MatchAny
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
+from embedded_index import create_client
+from qdrant_schema import SEARCH_PARAMS
+from chunked_index import chunk_collection_name, aggregate_chunk_groups, CHUNK_AGGREGATE, CHUNK_TOP_N
 
 # ✅ Qdrant 설정
-qdrant_client = QdrantClient(host="localhost", port=6333)
+qdrant_client = create_client(host="localhost", port=6333)  # VECTOR_BACKEND=embedded → 로컬 mmap 인덱스
 collection_name = "article_2025_image_test"
 
+# ✅ 재정렬 시 본문 전체 인코딩 대신 저장된 청크 벡터 사용 (python chunked_index.py article_2025_image_test content)
+CHUNKED_RERANK = os.environ.get("QDRANT_CHUNKED_SEARCH", "0") == "1"
+
 # ✅ 한국어 임베딩 모델
 model = SentenceTransformer("nlpai-lab/KURE-v1")
 
@@ -19,7 +25,7 @@ KEYWORD_FILTER_FIELDS = [
 ]
 
 # ✅ 벡터 기반 의미 검색 (전체 대상)
-def semantic_vector_search(question: str, top_k: int = 10):
+def semantic_vector_search(question: str, top_k: int = 10, search_params=SEARCH_PARAMS):
     print(f"\n🧠 [의미 기반 벡터 검색] 질문: {question}")
     start = time.time()
 
@@ -28,6 +34,7 @@ def semantic_vector_search(question: str, top_k: int = 10):
         results = qdrant_client.search(
             collection_name=collection_name,
             query_vector=query_vector,
+            search_params=search_params,
             limit=top_k,
             with_payload=True,
             score_threshold=0.5
@@ -165,22 +172,45 @@ def search_qdrant_metadata_by_keywords(keywords: List[str], top_k_per_keyword: i
     print(f"✅ 총 키워드 검색 결과 수: {len(documents_map)}")
     return list(documents_map.values())
 
+# ✅ 후보 문서별 청크 최대(또는 상위 n개 합) 유사도
+def chunk_similarities(query_vector, parent_ids: List, search_params=SEARCH_PARAMS) -> List[float]:
+    groups = qdrant_client.query_points_groups(
+        collection_name=chunk_collection_name(collection_name),
+        query=query_vector,
+        query_filter=Filter(must=[FieldCondition(key="parent_id", match=MatchAny(any=parent_ids))]),
+        search_params=search_params,
+        group_by="parent_id",
+        limit=len(parent_ids),
+        group_size=1 if CHUNK_AGGREGATE == "max" else CHUNK_TOP_N,
+        with_payload=["parent_collection", "chunk_text"]
+    ).groups
+    scores = {p["parent_id"]: p["score"] for p in aggregate_chunk_groups(groups, CHUNK_AGGREGATE, CHUNK_TOP_N)}
+    return [scores.get(pid) for pid in parent_ids]  # 청크가 없는 부모(미색인)는 None
+
 # ✅ 키워드 기반 필터 + 의미 기반 재정렬
-def keyword_then_semantic_rerank(question: str, keywords: List[str], top_k: int = 5):
+def keyword_then_semantic_rerank(question: str, keywords: List[str], top_k: int = 5, search_params=SEARCH_PARAMS):
     print(f"\n🔎 [종합 검색 시작] 질문: '{question}' | 키워드 필터: {keywords}")
 
     metadata_results = search_qdrant_metadata_smart(keywords, top_k_per_keyword=50)
 
     if not metadata_results:
         print("⚠️ 키워드 결과 없음 → 전체 의미 기반 검색으로 fallback")
-        return semantic_vector_search(question, top_k=top_k)
+        return semantic_vector_search(question, top_k=top_k, search_params=search_params)
 
     print("💡 키워드 결과 존재 → 의미 기반 재정렬 수행 중...")
     query_vector = model.encode(question)
-    contents = [doc["본문"] for doc in metadata_results]
-    doc_vectors = model.encode(contents, batch_size=32)
-
-    similarities = cosine_similarity([query_vector], doc_vectors)[0]
+    if CHUNKED_RERANK:
+        similarities = chunk_similarities(query_vector, [doc["id"] for doc in metadata_results], search_params)
+        # 청크 색인 전 부모는 전체 본문 임베딩으로 점수 계산
+        missing = [i for i, s in enumerate(similarities) if s is None]
+        if missing:
+            doc_vectors = model.encode([metadata_results[i]["본문"] for i in missing], batch_size=32)
+            for i, s in zip(missing, cosine_similarity([query_vector], doc_vectors)[0]):
+                similarities[i] = s
+    else:
+        contents = [doc["본문"] for doc in metadata_results]
+        doc_vectors = model.encode(contents, batch_size=32)
+        similarities = cosine_similarity([query_vector], doc_vectors)[0]
 
     reranked = []
     for i, doc in enumerate(metadata_results):
@@ -0,0 +1,166 @@
+import os
+import sys
+from typing import Optional
+from qdrant_client.models import (
+    Distance, VectorParams, SearchParams, QuantizationSearchParams,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    BinaryQuantization, BinaryQuantizationConfig, VectorParamsDiff, Disabled,
+    PayloadSchemaType,
+)
+
+# ─────────────────────────────────────────────
+# ✅ 양자화 설정 (none | scalar | binary)
+# ─────────────────────────────────────────────
+QUANTIZATION_MODE = os.environ.get("QDRANT_QUANTIZATION", "none")
+VECTOR_SIZE = 1024               # KURE-v1 임베딩 차원
+
+# 양자화 벡터로 후보를 oversampling 배 만큼 뽑고 원본 벡터로 재점수화
+DEFAULT_OVERSAMPLING = {"scalar": 2.0, "binary": 3.0}
+QUANTIZATION_MODES = ("none", "scalar", "binary")
+
+# ✅ 장애유형 전체 경로 (대>중>소) → 소분류 이름이 같은 다른 장애유형이 한 그룹으로 묶이지 않도록
+FAULT_PATH_FIELD = "fault_path"
+FAULT_PATH_LEVELS = ("fault_major", "fault_mid", "fault_minor")
+
+# ✅ 그룹 검색(group_by) / record_id 조회용 keyword 페이로드 인덱스
+KEYWORD_INDEX_FIELDS = ["store_code", FAULT_PATH_FIELD, "record_id"]
+
+
+def check_quantization_mode(mode: str):
+    if mode not in QUANTIZATION_MODES + ("", None):
+        raise ValueError(f"지원하지 않는 양자화 모드: {mode} (허용: {', '.join(QUANTIZATION_MODES)})")
+
+
+def quantization_config(mode: str = QUANTIZATION_MODE):
+    """컬렉션 생성/변경용 양자화 설정 (양자화 벡터는 항상 RAM 상주)"""
+    check_quantization_mode(mode)
+    if mode == "scalar":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if mode == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def build_search_params(mode: str = QUANTIZATION_MODE, oversampling: Optional[float] = None,
+                        rescore: bool = True, hnsw_ef: Optional[int] = None,
+                        exact: bool = False) -> Optional[SearchParams]:
+    """질의 시 search_params (양자화 후보 oversampling + 원본 벡터 rescoring)"""
+    check_quantization_mode(mode)
+    if exact:
+        return SearchParams(exact=True)
+    if mode in ("none", "", None):
+        return SearchParams(hnsw_ef=hnsw_ef) if hnsw_ef else None
+    return SearchParams(
+        hnsw_ef=hnsw_ef,
+        quantization=QuantizationSearchParams(
+            ignore=False,
+            rescore=rescore,
+            oversampling=oversampling or DEFAULT_OVERSAMPLING[mode],
+        ),
+    )
+
+
+# ✅ 기본 질의 파라미터 (검색 함수에서 search_params 미지정 시 사용)
+SEARCH_PARAMS = build_search_params()
+
+
+def create_search_collection(client, name: str, vector_size: int = VECTOR_SIZE,
+                             on_disk: bool = False, quantization: str = QUANTIZATION_MODE):
+    """
+    검색용 컬렉션 생성
+    - 양자화 사용 시 원본 float32 벡터는 on_disk 로 두고 양자화 벡터만 RAM 에 유지
+    """
+    if client.collection_exists(name):
+        return name
+
+    quant = quantization_config(quantization)
+    client.create_collection(
+        collection_name=name,
+        vectors_config=VectorParams(
+            size=vector_size,
+            distance=Distance.COSINE,
+            on_disk=on_disk or quant is not None,
+        ),
+        quantization_config=quant,
+        on_disk_payload=on_disk,
+    )
+    create_payload_indexes(client, name)
+    print(f"🗂 컬렉션 생성: {name} (on_disk={on_disk}, quantization={quantization})")
+    return name
+
+
+def create_payload_indexes(client, name: str, fields=KEYWORD_INDEX_FIELDS):
+    """group_by / 필터 대상 필드에 keyword 인덱스 생성 (이미 있으면 Qdrant 가 무시)"""
+    for field in fields:
+        client.create_payload_index(
+            collection_name=name,
+            field_name=field,
+            field_schema=PayloadSchemaType.KEYWORD,
+        )
+
+
+def fault_path(payload: dict) -> str:
+    """장애유형 대>중>소 경로 문자열 (비어 있는 단계는 "-" → 불완전 경로도 그룹 검색에서 빠지지 않음)"""
+    return ">".join("-" if payload.get(f) in (None, "") else str(payload.get(f)) for f in FAULT_PATH_LEVELS)
+
+
+def with_fault_path(payload: dict) -> dict:
+    """payload 에 fault_path 필드 추가 (색인/마이그레이션 시 사용)"""
+    return {**payload, FAULT_PATH_FIELD: fault_path(payload)}
+
+
+def backfill_fault_path(client, name: str, batch_size: int = 1024):
+    """기존 컬렉션 포인트에 fault_path 페이로드 일괄 추가 (경로별 set_payload)"""
+    ids_by_path = {}
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=name, limit=batch_size, offset=offset,
+            with_payload=list(FAULT_PATH_LEVELS), with_vectors=False,
+        )
+        for p in points:
+            ids_by_path.setdefault(fault_path(p.payload), []).append(p.id)
+        if offset is None:
+            break
+
+    for path, ids in ids_by_path.items():
+        for s in range(0, len(ids), batch_size):
+            client.set_payload(collection_name=name, payload={FAULT_PATH_FIELD: path}, points=ids[s:s + batch_size])
+    create_payload_indexes(client, name, [FAULT_PATH_FIELD])
+    print(f"🏷 fault_path 추가: {name} ({sum(map(len, ids_by_path.values()))}건, 경로 {len(ids_by_path)}개)")
+
+
+def enable_quantization(client, name: str, quantization: str = QUANTIZATION_MODE):
+    """기존 컬렉션에 양자화 적용 (백그라운드 옵티마이저가 재색인)"""
+    quant = quantization_config(quantization)
+    client.update_collection(
+        collection_name=name,
+        vectors_config={"": VectorParamsDiff(on_disk=quant is not None)},
+        quantization_config=quant or Disabled.DISABLED,
+    )
+    print(f"⚙️ 양자화 적용: {name} → {quantization}")
+
+
+if __name__ == "__main__":
+    # 사용법: python qdrant_schema.py quantize <컬렉션> [none|scalar|binary]
+    #         python qdrant_schema.py fault-path <컬렉션>
+    #   예) python qdrant_schema.py quantize retailtech_test scalar
+    #       python qdrant_schema.py quantize article_2025_image_test binary
+    #       python qdrant_schema.py fault-path retailtech_test
+    usage = "사용법: python qdrant_schema.py quantize <컬렉션> [none|scalar|binary] | fault-path <컬렉션>"
+    if len(sys.argv) < 3 or (sys.argv[1], len(sys.argv)) not in (
+        ("quantize", 3), ("quantize", 4), ("fault-path", 3)
+    ):
+        print(usage)
+        sys.exit(1)
+
+    from qdrant_client import QdrantClient
+    qdrant = QdrantClient(host="localhost", port=6333)
+    if sys.argv[1] == "fault-path":
+        backfill_fault_path(qdrant, sys.argv[2])
+    else:
+        mode = sys.argv[3] if len(sys.argv) == 4 else QUANTIZATION_MODE
+        quantization_config(mode)  # 잘못된 모드면 ValueError
+        enable_quantization(qdrant, sys.argv[2], mode)
@@ -1,17 +1,29 @@
 import gc
+import sys
+import os
+import time
 import torch
 import re
-from typing import List, Tuple, Dict, Set
+from datetime import datetime
+from typing import List, Tuple, Dict, Set, Optional
 from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
 from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
-from qdrant_client.models import MatchValue, MatchAny, Filter, FieldCondition
+from qdrant_client.http.exceptions import UnexpectedResponse
+from qdrant_client.models import (
+    MatchValue, MatchAny, Filter, FieldCondition, PointStruct, VectorParamsDiff, CollectionParamsDiff,
+)
 from sklearn.metrics.pairwise import cosine_similarity
+from embedded_index import create_client
+from qdrant_schema import (
+    VECTOR_SIZE, QUANTIZATION_MODE, SEARCH_PARAMS, FAULT_PATH_FIELD, create_search_collection, with_fault_path,
+)
+from chunked_index import CHUNK_SUFFIX, CHUNK_AGGREGATE, CHUNK_TOP_N, aggregate_chunk_groups, fetch_parent_points
 
 # ─────────────────────────────────────────────
 # ✅ Qdrant 설정
 # ─────────────────────────────────────────────
-qdrant_client = QdrantClient(host="localhost", port=6333)
+qdrant_client = create_client(host="localhost", port=6333)  # VECTOR_BACKEND=embedded → 로컬 mmap 인덱스
 collection_name = "retailtech_test"
 
 # ─────────────────────────────────────────────
@@ -26,6 +38,349 @@ def encode_and_clear(texts, **kwargs):
     return vectors
 
 
+# ─────────────────────────────────────────────
+# ✅ 연도별 파티션 (retailtech_test_2024, retailtech_test_2025 ...)
+# ─────────────────────────────────────────────
+PARTITION_BY_YEAR = os.environ.get("QDRANT_PARTITION_BY_YEAR", "0") == "1"
+PARTITION_HOT_YEARS = 2          # 최근 N개 연도만 RAM, 나머지는 on_disk(mmap)
+PARTITION_CACHE_TTL = 60         # 파티션 목록 캐시 유지 시간(초)
+UNDATED_PARTITION = "undated"    # year 없는 접수건 파티션 (연도 미지정 검색에만 포함)
+CHUNKED_SEARCH = os.environ.get("QDRANT_CHUNKED_SEARCH", "0") == "1"   # <컬렉션>_chunks 청크 검색 사용
+
+_partition_cache = {"loaded_at": 0.0, "partitions": {}, "undated": None}
+
+
+def partition_name(year: Optional[int]) -> str:
+    """연도 파티션명 (year 가 None 이면 undated 파티션)"""
+    if year is None:
+        return f"{collection_name}_{UNDATED_PARTITION}"
+    return f"{collection_name}_{int(year)}"
+
+
+def is_cold_year(year: int) -> bool:
+    return int(year) <= datetime.now().year - PARTITION_HOT_YEARS
+
+
+def list_partitions(refresh: bool = False) -> Dict[int, str]:
+    """존재하는 연도 파티션 목록 {연도: 컬렉션명} (TTL 캐시)"""
+    if not refresh and time.time() - _partition_cache["loaded_at"] < PARTITION_CACHE_TTL:
+        return _partition_cache["partitions"]
+
+    prefix = f"{collection_name}_"
+    partitions = {}
+    undated = None
+    for c in qdrant_client.get_collections().collections:
+        suffix = c.name[len(prefix):] if c.name.startswith(prefix) else ""
+        if re.fullmatch(r"\d{4}", suffix):
+            partitions[int(suffix)] = c.name
+        elif suffix == UNDATED_PARTITION:
+            undated = c.name
+
+    _partition_cache["partitions"] = dict(sorted(partitions.items()))
+    _partition_cache["undated"] = undated
+    _partition_cache["loaded_at"] = time.time()
+    return _partition_cache["partitions"]
+
+
+def target_collections(years: Optional[Set[int]] = None) -> List[str]:
+    """검색 대상 컬렉션 결정: 연도 조건이 있으면 해당 파티션만, 없으면 전체 파티션 + undated"""
+    if not PARTITION_BY_YEAR:
+        return [collection_name]
+
+    partitions = list_partitions()
+    if years:
+        return [partitions[y] for y in sorted(years) if y in partitions]
+    undated = _partition_cache["undated"]
+    return list(partitions.values()) + ([undated] if undated else [])
+
+
+def create_year_partition(year: Optional[int], vector_size: int = VECTOR_SIZE, on_disk: Optional[bool] = None,
+                          quantization: str = QUANTIZATION_MODE):
+    """연도 파티션 생성 (오래된 연도는 벡터/페이로드를 디스크(mmap)에 저장, year=None → undated)"""
+    if on_disk is None:
+        on_disk = year is not None and is_cold_year(year)
+
+    name = create_search_collection(
+        qdrant_client, partition_name(year),
+        vector_size=vector_size, on_disk=on_disk, quantization=quantization,
+    )
+    list_partitions(refresh=True)
+    return name
+
+
+def migrate_to_year_partitions(batch_size: int = 256):
+    """단일 컬렉션 → 연도별 파티션으로 포인트 복사 (year 없는 접수건은 undated 파티션)"""
+    offset = None
+    copied = 0
+    undated = 0
+    created = set()
+    dim = qdrant_client.get_collection(collection_name).config.params.vectors.size
+    while True:
+        points, offset = qdrant_client.scroll(
+            collection_name=collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+
+        by_year: Dict[Optional[int], List[PointStruct]] = {}
+        for p in points:
+            year = p.payload.get("year")
+            year = int(year) if year and str(year).isdigit() else None
+            by_year.setdefault(year, []).append(
+                PointStruct(id=p.id, vector=p.vector, payload=with_fault_path(p.payload))
+            )
+
+        for year, batch in by_year.items():
+            if year not in created:
+                create_year_partition(year, vector_size=dim)
+                created.add(year)
+            qdrant_client.upsert(collection_name=partition_name(year), points=batch)
+            copied += len(batch)
+            if year is None:
+                undated += len(batch)
+
+        if offset is None:
+            break
+
+    years = sorted(y for y in created if y is not None)
+    print(f"✅ 파티션 마이그레이션 완료: {copied}건 → {years} (연도 없음 {undated}건 → {partition_name(None)})")
+    return copied
+
+
+def retier_partitions():
+    """
+    연도가 지나 오래된 파티션이 된 경우 벡터/페이로드를 on_disk 로 전환 (최근 연도는 RAM 으로 복귀)
+    양자화 컬렉션은 원본 벡터를 항상 on_disk 로 유지
+    """
+    changed = []
+    for year, name in list_partitions(refresh=True).items():
+        cold = is_cold_year(year)
+        config = qdrant_client.get_collection(name).config
+        vectors_on_disk = cold or config.quantization_config is not None
+
+        if bool(config.params.vectors.on_disk) == vectors_on_disk and bool(config.params.on_disk_payload) == cold:
+            continue
+        qdrant_client.update_collection(
+            collection_name=name,
+            vectors_config={"": VectorParamsDiff(on_disk=vectors_on_disk)},
+            collection_params=CollectionParamsDiff(on_disk_payload=cold),
+        )
+        changed.append(name)
+        print(f"🧊 파티션 재배치: {name} → {'on_disk' if cold else 'RAM'}")
+
+    print(f"✅ 파티션 재배치 완료: {len(changed)}개 변경")
+    return changed
+
+
+def search_points(query_vector, query_filter=None, limit: int = 10, years: Optional[Set[int]] = None,
+                  search_params=SEARCH_PARAMS):
+    """파티션 라우팅 벡터 검색: 대상 파티션이 여럿이면 병렬 조회 후 점수순 병합"""
+    targets = target_collections(years)
+    if not targets:
+        return []
+
+    def _search(name):
+        return qdrant_client.search(
+            collection_name=name,
+            query_vector=query_vector,
+            query_filter=query_filter,
+            search_params=search_params,
+            limit=limit,
+            with_payload=True
+        )
+
+    if len(targets) == 1:
+        return _search(targets[0])
+
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        hits = [hit for hits in executor.map(_search, targets) for hit in hits]
+    hits.sort(key=lambda h: h.score, reverse=True)
+    return hits[:limit]
+
+
+def query_points_partitioned(query_filter=None, limit: int = 10, years: Optional[Set[int]] = None, **kwargs):
+    """
+    파티션 라우팅 필터 조회 (query_points) → 포인트 리스트
+    파티션이 여럿이면 최신 연도부터 번갈아 채워 limit 이 가장 오래된 파티션에 몰리지 않도록 함
+    """
+    targets = target_collections(years)
+    if not targets:
+        return []
+
+    def _query(name):
+        return qdrant_client.query_points(
+            collection_name=name,
+            query_filter=query_filter,
+            limit=limit,
+            **kwargs
+        ).points
+
+    if len(targets) == 1:
+        return _query(targets[0])
+
+    # target_collections 는 오래된 연도 → 최신 연도 → undated 순
+    undated = partition_name(None)
+    ordered = [n for n in reversed(targets) if n != undated] + [n for n in targets if n == undated]
+    with ThreadPoolExecutor(max_workers=len(ordered)) as executor:
+        results = list(executor.map(_query, ordered))
+    points = [p for row in zip_longest(*results) for p in row if p is not None]
+    return points[:limit]
+
+
+# ─────────────────────────────────────────────
+# ✅ 그룹 검색 (점포 / 장애유형별 중복 접수건 묶기)
+# ─────────────────────────────────────────────
+GROUP_BY_FIELDS = {
+    "store": "store_code",
+    "fault": FAULT_PATH_FIELD,   # 대>중>소 전체 경로 (python qdrant_schema.py fault-path <컬렉션> 로 기존 데이터 보강)
+}
+GROUP_HIT_FIELDS = ["record_id", "title"]   # 묶인 중복 접수건(duplicates) 출력에 쓰는 필드만 조회
+
+
+def search_groups(query_vector, group_by: str, query_filter=None, limit: int = 10, group_size: int = 1,
+                  years: Optional[Set[int]] = None, search_params=SEARCH_PARAMS, collection_suffix: str = "",
+                  with_payload=True):
+    """
+    query_points_groups 로 group_by 필드값별 상위 group_size 건만 조회
+    파티션이 여럿이면 병렬 조회 후 같은 그룹끼리 병합
+    collection_suffix: 청크 컬렉션(_chunks) 등 파티션별 보조 컬렉션 조회 시 사용
+    with_payload: 필드명 리스트로 지정하면 그 필드만 조회
+    """
+    targets = [name + collection_suffix for name in target_collections(years)]
+    if not targets:
+        return []
+
+    def _groups(name):
+        return qdrant_client.query_points_groups(
+            collection_name=name,
+            query=query_vector,
+            query_filter=query_filter,
+            search_params=search_params,
+            group_by=group_by,
+            limit=limit,
+            group_size=group_size,
+            with_payload=with_payload
+        ).groups
+
+    if len(targets) == 1:
+        return _groups(targets[0])
+
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        merged = {}
+        for groups in executor.map(_groups, targets):
+            for g in groups:
+                if g.id in merged:
+                    merged[g.id].hits.extend(g.hits)
+                else:
+                    merged[g.id] = g
+
+    for g in merged.values():
+        g.hits.sort(key=lambda h: h.score, reverse=True)
+        del g.hits[group_size:]
+    return sorted(merged.values(), key=lambda g: g.hits[0].score, reverse=True)[:limit]
+
+
+def fill_representative_payloads(groups, years: Optional[Set[int]] = None):
+    """그룹 대표 접수건만 전체 payload 조회 (파티션별 retrieve, 나머지 hit 은 GROUP_HIT_FIELDS 만 유지)"""
+    ids = [g.hits[0].id for g in groups]
+    if not ids:
+        return groups
+    payloads = {}
+    for name in target_collections(years):
+        for record in qdrant_client.retrieve(collection_name=name, ids=ids, with_payload=True):
+            payloads[record.id] = record.payload
+    for g in groups:
+        g.hits[0].payload = payloads.get(g.hits[0].id, g.hits[0].payload)
+    return groups
+
+
+def apply_group_results(groups, text_keywords, top_k):
+    """그룹 대표 접수건만 출력 포맷으로 변환하고, 묶인 중복 접수건은 duplicates 로 첨부"""
+    reranked = apply_keyword_bonus([g.hits[0] for g in groups], text_keywords, top_k)
+    group_of = {g.hits[0].id: g for g in groups}
+
+    for doc in reranked:
+        g = group_of[doc["id"]]
+        doc["group_key"] = g.id
+        doc["duplicates"] = [
+            {
+                "record_id": h.payload.get("record_id", "없음"),
+                "title": h.payload.get("title", "제목 없음"),
+                "score": round(float(h.score), 5),
+            }
+            for h in g.hits[1:]
+        ]
+    return reranked
+
+
+def retrieve_ranked(query_vector, query_filter, text_keywords, top_k: int, years: Optional[Set[int]] = None,
+                    search_params=SEARCH_PARAMS, group_by: Optional[str] = None, group_size: int = 1):
+    """
+    벡터 검색 → 출력 포맷
+    group_by 지정 시 그룹 대표만, CHUNKED_SEARCH 면 청크 점수를 부모 문서 단위로 집계해 문서 검색 결과와 병합
+    """
+    if group_by:
+        groups = []
+        try:
+            groups = search_groups(
+                query_vector=query_vector,
+                group_by=GROUP_BY_FIELDS[group_by],
+                query_filter=query_filter,
+                limit=top_k,
+                group_size=group_size,
+                years=years,
+                search_params=search_params,
+                with_payload=GROUP_HIT_FIELDS
+            )
+        except (ValueError, UnexpectedResponse) as e:
+            # 임베디드 인덱스에 그룹 필드 컬럼이 없거나 Qdrant 가 group_by 를 거부한 경우
+            print(f"⚠️ 그룹 검색 실패 ({GROUP_BY_FIELDS[group_by]}): {e}")
+        if groups:
+            return apply_group_results(fill_representative_payloads(groups, years), text_keywords, top_k)
+        # 그룹 필드가 없는 컬렉션(fault_path 미보강 등)에서 결과가 0건이 되지 않도록 그룹 없이 검색
+        print(f"⚠️ 그룹 결과 없음 → '{GROUP_BY_FIELDS[group_by]}' 필드 보강 여부 확인 필요, 그룹 없이 검색")
+
+    results = search_points(
+        query_vector=query_vector,
+        query_filter=query_filter,
+        limit=top_k * 10,
+        years=years,
+        search_params=search_params
+    )
+
+    if CHUNKED_SEARCH:
+        # 문서 전체 벡터 검색 결과와 부모 id 기준 병합 (최대 점수) → 청크 색인 전에 추가된 접수건도 유지
+        chunk_groups = search_groups(
+            query_vector=query_vector,
+            group_by="parent_id",
+            query_filter=query_filter,
+            limit=top_k,
+            group_size=1 if CHUNK_AGGREGATE == "max" else CHUNK_TOP_N,
+            years=years,
+            search_params=search_params,
+            collection_suffix=CHUNK_SUFFIX,
+            with_payload=["parent_collection", "chunk_text"]
+        )
+        parents = aggregate_chunk_groups(chunk_groups, CHUNK_AGGREGATE, CHUNK_TOP_N)
+        results = merge_parent_results(results, parents)
+
+    return apply_keyword_bonus(results, text_keywords, top_k)
+
+
+def merge_parent_results(results, parents: List[dict]):
+    """문서 벡터 검색 hit + 청크 집계 부모 점수 → 부모 id 별 최대 점수 (payload 는 없는 부모만 추가 조회)"""
+    merged = {hit.id: hit for hit in results}
+    for p in parents:
+        hit = merged.get(p["parent_id"])
+        if hit is not None:
+            hit.score = max(hit.score, p["score"])
+    for point in fetch_parent_points(qdrant_client, [p for p in parents if p["parent_id"] not in merged]):
+        merged[point.id] = point
+    return sorted(merged.values(), key=lambda h: h.score, reverse=True)
+
+
 # ─────────────────────────────────────────────
 # ✅ 공통 점수 보정 함수 (RetailTech 출력 포맷)
 # ─────────────────────────────────────────────
@@ -120,9 +475,11 @@ def apply_keyword_bonus(results, text_keywords, top_k):
 def keyword_search_single(keyword: str, top_k: int = 30) -> Tuple[Set, Dict, str]:
     keyword_type = "none"
     query_filter = None
+    years = None
 
     if re.fullmatch(r"\d{4}", keyword):  # 연도
         keyword_type = "year"
+        years = {int(keyword)}
         query_filter = Filter(must=[
             FieldCondition(key="year", match=MatchValue(value=int(keyword)))
         ])
@@ -145,16 +502,16 @@ def keyword_search_single(keyword: str, top_k: int = 30) -> Tuple[Set, Dict, str
             FieldCondition(key="store_code", match=MatchValue(value=keyword)),  # ✅ 점포코드 검색
         ])
 
-    result = qdrant_client.query_points(
-        collection_name=collection_name,
+    points = query_points_partitioned(
         query_filter=query_filter,
         limit=top_k,
+        years=years,
         with_payload=True,
         with_vectors=True,
     )
 
-    ids = {p.id for p in result.points}
-    payloads = {p.id: {"payload": p.payload, "vector": p.vector} for p in result.points}
+    ids = {p.id for p in points}
+    payloads = {p.id: {"payload": p.payload, "vector": p.vector} for p in points}
 
     return ids, payloads, keyword_type
 
@@ -186,7 +543,8 @@ def search_qdrant_metadata_parallel(keywords: List[str], top_k_per_keyword: int
 # ─────────────────────────────────────────────
 # ✅ 날짜 + 키워드 결합 검색
 # ─────────────────────────────────────────────
-def keyword_then_semantic_rerank(question: str, keywords: List[str], top_k: int = 5):
+def keyword_then_semantic_rerank(question: str, keywords: List[str], top_k: int = 5, search_params=SEARCH_PARAMS,
+                                 group_by: Optional[str] = None, group_size: int = 1):
     print("\n" + "=" * 80)
     print(f"🧩 [keyword_then_semantic_rerank] 검색 요청 시작")
     print(f"📥 질문: {question}")
@@ -205,6 +563,7 @@ def keyword_then_semantic_rerank(question: str, keywords: List[str], top_k: int
         print("\n⚡ [1단계] 날짜 + 키워드 결합 → Qdrant 검색 실행")
         query_vector = encode_and_clear([question])[0]
 
+        years = {int(kw) for kw in date_keywords if keyword_types[kw] == "year"}
         must_conditions = []
         for kw in date_keywords:
             kw_type = keyword_types[kw]
@@ -226,19 +585,16 @@ def keyword_then_semantic_rerank(question: str, keywords: List[str], top_k: int
             must_conditions.append(Filter(should=should_conditions))
 
         filter_query = Filter(must=must_conditions)
-        results = qdrant_client.search(
-            collection_name=collection_name,
-            query_vector=query_vector,
-            query_filter=filter_query,
-            limit=top_k * 10,
-            with_payload=True
+        ranked = retrieve_ranked(
+            query_vector, filter_query, text_keywords, top_k,
+            years=years, search_params=search_params, group_by=group_by, group_size=group_size
         )
 
-        if not results:
+        if not ranked:
             print("⚠️ [1단계] 검색 결과 0건 → 의미검색 fallback 실행")
-            return semantic_vector_search(question, top_k)
+            return semantic_vector_search(question, top_k, search_params, group_by, group_size)
 
-        return apply_keyword_bonus(results, text_keywords, top_k)
+        return ranked
 
     # 키워드만 있을 경우
     elif text_keywords:
@@ -252,43 +608,41 @@ def keyword_then_semantic_rerank(question: str, keywords: List[str], top_k: int
                 FieldCondition(key="keywords", match={"text": kw}),
             ])
         filter_query = Filter(should=should_conditions)
-        results = qdrant_client.search(
-            collection_name=collection_name,
-            query_vector=query_vector,
-            query_filter=filter_query,
-            limit=top_k * 10,
-            with_payload=True
+        ranked = retrieve_ranked(
+            query_vector, filter_query, text_keywords, top_k,
+            search_params=search_params, group_by=group_by, group_size=group_size
         )
 
-        if not results:
+        if not ranked:
             print("⚠️ [2단계] 검색 결과 0건 → 의미검색 fallback 실행")
-            return semantic_vector_search(question, top_k)
+            return semantic_vector_search(question, top_k, search_params, group_by, group_size)
 
-        return apply_keyword_bonus(results, text_keywords, top_k)
+        return ranked
 
     # 아무것도 없을 경우 → 의미검색 fallback
     else:
         print("\n⚠️ [3단계] 필터 없음 → 전체 의미검색 fallback")
-        results = qdrant_client.search(
-            collection_name=collection_name,
-            query_vector=encode_and_clear([question])[0],
-            limit=top_k * 10,
-            with_payload=True
+        return retrieve_ranked(
+            encode_and_clear([question])[0], None, keywords, top_k,
+            search_params=search_params, group_by=group_by, group_size=group_size
         )
-        return apply_keyword_bonus(results, keywords, top_k)
 
 
 # ─────────────────────────────────────────────
 # ✅ 의미검색 fallback (단순 벡터검색)
 # ─────────────────────────────────────────────
-def semantic_vector_search(question: str, top_k: int = 30):
+def semantic_vector_search(question: str, top_k: int = 30, search_params=SEARCH_PARAMS,
+                           group_by: Optional[str] = None, group_size: int = 1):
     print("\n⚙️ [단순 의미검색 fallback] 실행 중...")
     query_vector = encode_and_clear([question])[0]
-    results = qdrant_client.search(
-        collection_name=collection_name,
+    if group_by:
+        return retrieve_ranked(query_vector, None, [], top_k, search_params=search_params,
+                               group_by=group_by, group_size=group_size)
+
+    results = search_points(
         query_vector=query_vector,
         limit=top_k,
-        with_payload=True
+        search_params=search_params
     )
 
     reranked = []
@@ -360,3 +714,16 @@ def semantic_vector_search(question: str, top_k: int = 30):
 
     print("\n🎯 의미검색 완료. 상위 결과를 반환합니다.")
     return reranked
+
+
+if __name__ == "__main__":
+    # 사용법: python qdrant_utils.py migrate   # 단일 컬렉션 → 연도별 파티션 복사
+    #         python qdrant_utils.py retier    # 연도 경과에 따라 파티션 RAM / on_disk 재배치
+    if len(sys.argv) != 2 or sys.argv[1] not in ("migrate", "retier"):
+        print("사용법: python qdrant_utils.py migrate | retier")
+        sys.exit(1)
+
+    if sys.argv[1] == "migrate":
+        migrate_to_year_partitions()
+    else:
+        retier_partitions()
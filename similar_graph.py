@@ -0,0 +1,353 @@
+"""
+유사 장애 그래프 (record_id → 상위 k개 유사 접수건)
+
+사용법:
+  python similar_graph.py build [컬렉션 ...]            # 전체 재계산
+  python similar_graph.py refresh [--collections 컬렉션 ...] <record_id> [...]
+                                                          # 변경/삭제된 접수건만 증분 갱신
+
+- 저장된 KURE 벡터로 블록 단위 행렬곱 → 행별 top-k 이웃
+- 모드별 이웃 테이블: all(전체) / store(동일 점포) / fault(동일 장애유형 대>중>소)
+- 결과는 int32 이웃 행 번호 + float16 점수 배열로 저장, API 는 mmap 으로 조회
+"""
+import os
+import json
+import argparse
+import time
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional
+from qdrant_client import QdrantClient
+from qdrant_client.models import Filter, FieldCondition, MatchAny
+
+# ─────────────────────────────────────────────
+# ✅ 설정
+# ─────────────────────────────────────────────
+SIMILAR_GRAPH_DIR = Path(os.environ.get("SIMILAR_GRAPH_DIR", "similar_graph"))
+SIMILAR_COLLECTIONS = ["retailtech_test"]
+SIMILAR_TOP_K = 20
+QUERY_BLOCK_ROWS = 1024       # 한 번에 처리할 질의 행 수
+CORPUS_BLOCK_ROWS = 16384     # 한 번에 비교할 대상 행 수
+
+# 모드별 그룹 키 (같은 그룹 안에서만 이웃 탐색)
+GROUP_MODES = {
+    "all": (),
+    "store": ("store_code",),
+    "fault": ("fault_major", "fault_mid", "fault_minor"),
+}
+
+# API 응답용으로 보관하는 최소 필드
+RECORD_FIELDS = [
+    "record_id", "store_name", "store_code", "title",
+    "fault_major", "fault_mid", "fault_minor", "year", "month", "day",
+]
+
+
+# ─────────────────────────────────────────────
+# ✅ 블록 단위 top-k
+# ─────────────────────────────────────────────
+def _merge_topk(best_rows, best_scores, cand_rows, cand_scores, k):
+    rows = np.concatenate([best_rows, cand_rows], axis=1)
+    scores = np.concatenate([best_scores, cand_scores], axis=1)
+    if scores.shape[1] > k:
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        rows = np.take_along_axis(rows, keep, axis=1)
+        scores = np.take_along_axis(scores, keep, axis=1)
+    return rows, scores
+
+
+def _finalize(rows, scores, k):
+    """점수 내림차순 정렬 + k 칸 미만이면 -1 로 채움"""
+    order = np.argsort(-scores, axis=1, kind="stable")
+    rows = np.take_along_axis(rows, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    rows = np.where(np.isfinite(scores), rows, -1)
+    if rows.shape[1] < k:
+        pad = k - rows.shape[1]
+        rows = np.pad(rows, ((0, 0), (0, pad)), constant_values=-1)
+        scores = np.pad(scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+    return rows.astype(np.int32), scores
+
+
+def knn_blocked(vectors: np.ndarray, query_rows: np.ndarray, corpus_rows: np.ndarray, k: int):
+    """query_rows 각각에 대해 corpus_rows 중 상위 k개 (자기 자신 제외)"""
+    out_rows = np.full((len(query_rows), k), -1, dtype=np.int32)
+    out_scores = np.full((len(query_rows), k), -np.inf, dtype=np.float32)
+
+    for qs in range(0, len(query_rows), QUERY_BLOCK_ROWS):
+        q_rows = query_rows[qs:qs + QUERY_BLOCK_ROWS]
+        q = np.asarray(vectors[q_rows], dtype=np.float32)
+        best_rows = np.empty((len(q_rows), 0), dtype=np.int64)
+        best_scores = np.empty((len(q_rows), 0), dtype=np.float32)
+
+        for cs in range(0, len(corpus_rows), CORPUS_BLOCK_ROWS):
+            c_rows = corpus_rows[cs:cs + CORPUS_BLOCK_ROWS]
+            scores = q @ np.asarray(vectors[c_rows], dtype=np.float32).T
+            scores[q_rows[:, None] == c_rows[None, :]] = -np.inf
+            cand_rows = np.broadcast_to(c_rows, scores.shape)
+            best_rows, best_scores = _merge_topk(best_rows, best_scores, cand_rows, scores, k)
+
+        rows, scores = _finalize(best_rows, best_scores, k)
+        out_rows[qs:qs + len(q_rows)] = rows
+        out_scores[qs:qs + len(q_rows)] = scores
+
+    return out_rows, out_scores
+
+
+def group_rows(records: List[dict], mode: str) -> Dict[tuple, np.ndarray]:
+    """모드별 그룹 키 → 행 번호 배열 (삭제된 행 제외)"""
+    fields = GROUP_MODES[mode]
+    groups: Dict[tuple, list] = {}
+    for row, rec in enumerate(records):
+        if rec.get("deleted"):
+            continue
+        key = tuple(rec.get(f) for f in fields)
+        if fields and any(v in (None, "", "-") for v in key):
+            continue  # 그룹 키가 비어 있으면 해당 모드에서 제외
+        groups.setdefault(key, []).append(row)
+    return {key: np.asarray(rows, dtype=np.int64) for key, rows in groups.items()}
+
+
+# ─────────────────────────────────────────────
+# ✅ 저장 / 로드
+# ─────────────────────────────────────────────
+def _save_npy(path: Path, array: np.ndarray):
+    tmp = path.with_suffix(".tmp.npy")
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+
+def _save_json(path: Path, data):
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _save_graph(out_dir: Path, vectors, records, tables):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    _save_npy(out_dir / "vectors.npy", vectors)
+    for mode, (rows, scores) in tables.items():
+        _save_npy(out_dir / f"{mode}_neighbors.npy", rows)
+        _save_npy(out_dir / f"{mode}_scores.npy", scores.astype(np.float16))
+    # records.json 을 마지막에 교체 → API 는 이 파일 변경 시각으로 재로딩
+    _save_json(out_dir / "records.json", records)
+
+
+def _fetch_points(client: QdrantClient, collections: List[str], query_filter=None, batch_size: int = 512):
+    """컬렉션 scroll → (정규화 float16 벡터, 레코드 메타), 배치마다 미리 할당한 float16 배열에 기록"""
+    counts = [client.count(collection_name=name, count_filter=query_filter, exact=True).count for name in collections]
+    if not sum(counts):
+        return np.empty((0, 0), dtype=np.float16), []
+    dim = client.get_collection(collections[0]).config.params.vectors.size
+    vectors = np.empty((sum(counts), dim), dtype=np.float16)
+    records = []
+
+    for name, count in zip(collections, counts):
+        fetched = 0
+        offset = None
+        while fetched < count:
+            points, offset = client.scroll(
+                collection_name=name, scroll_filter=query_filter, limit=batch_size,
+                offset=offset, with_payload=True, with_vectors=True,
+            )
+            if not points:
+                break
+
+            points = points[:count - fetched]
+            batch = np.asarray([p.vector for p in points], dtype=np.float32)
+            norms = np.linalg.norm(batch, axis=1, keepdims=True)
+            vectors[len(records):len(records) + len(points)] = batch / np.where(norms == 0, 1.0, norms)
+            records.extend({f: p.payload.get(f) for f in RECORD_FIELDS} for p in points)
+            fetched += len(points)
+            if offset is None:
+                break
+
+    return vectors[:len(records)], records
+
+
+# ─────────────────────────────────────────────
+# ✅ 전체 빌드
+# ─────────────────────────────────────────────
+def build_similar_graph(client: QdrantClient, collections: List[str] = SIMILAR_COLLECTIONS,
+                        out_dir: Path = SIMILAR_GRAPH_DIR, k: int = SIMILAR_TOP_K):
+    start = time.time()
+    vectors, records = _fetch_points(client, collections)
+    print(f"📥 벡터 로드: {len(records)}건 ({time.time() - start:.1f}초)")
+
+    tables = {}
+    for mode in GROUP_MODES:
+        rows = np.full((len(records), k), -1, dtype=np.int32)
+        scores = np.full((len(records), k), -np.inf, dtype=np.float32)
+        for members in group_rows(records, mode).values():
+            if len(members) > 1:
+                rows[members], scores[members] = knn_blocked(vectors, members, members, k)
+        tables[mode] = (rows, scores)
+        print(f"🔗 [{mode}] 이웃 계산 완료 ({time.time() - start:.1f}초)")
+
+    _save_graph(Path(out_dir), vectors, records, tables)
+    print(f"✅ 유사 장애 그래프 저장: {out_dir} ({time.time() - start:.1f}초)")
+
+
+# ─────────────────────────────────────────────
+# ✅ 증분 갱신 (변경/추가된 record_id 만)
+# ─────────────────────────────────────────────
+def _record_id_filter(record_ids: List[str]) -> Filter:
+    conditions = [FieldCondition(key="record_id", match=MatchAny(any=list(record_ids)))]
+    numeric = [int(r) for r in record_ids if str(r).isdigit()]
+    if numeric:
+        conditions.append(FieldCondition(key="record_id", match=MatchAny(any=numeric)))
+    return Filter(should=conditions)
+
+
+def refresh_similar_graph(client: QdrantClient, record_ids: List[str],
+                          collections: List[str] = SIMILAR_COLLECTIONS,
+                          out_dir: Path = SIMILAR_GRAPH_DIR):
+    """
+    변경된 행: 그룹 내 이웃 전체 재계산
+    변경/삭제된 행을 이웃으로 갖던 행: 점수/그룹이 바뀌었을 수 있으므로 재계산
+    나머지 행: 변경된 행과의 점수만 계산해 기존 top-k 에 병합
+    삭제된 행 (요청했지만 컬렉션에 없는 record_id): 행 번호 유지를 위해 삭제 표시만 남김
+    (삭제 표시 행은 build 로 전체 재생성 시 정리됨)
+    """
+    out_dir = Path(out_dir)
+    start = time.time()
+    new_vectors, new_records = _fetch_points(client, collections, _record_id_filter(record_ids))
+
+    with open(out_dir / "records.json", encoding="utf-8") as f:
+        records = json.load(f)
+    vectors = np.load(out_dir / "vectors.npy")
+    k = np.load(out_dir / "all_neighbors.npy", mmap_mode="r").shape[1]
+
+    row_of = {str(rec["record_id"]): row for row, rec in enumerate(records) if not rec.get("deleted")}
+    found = {str(rec["record_id"]) for rec in new_records}
+    deleted = [row_of[str(r)] for r in record_ids if str(r) not in found and str(r) in row_of]
+    for row in deleted:
+        records[row] = {**{f: None for f in RECORD_FIELDS}, "deleted": True}
+        vectors[row] = 0
+    deleted = np.asarray(sorted(set(deleted)), dtype=np.int64)
+
+    if not new_records and not len(deleted):
+        print("⚠️ 갱신할 접수건 없음")
+        return
+
+    changed = []
+    appended = []
+    for vec, rec in zip(new_vectors, new_records):
+        row = row_of.get(str(rec["record_id"]))
+        if row is None:
+            row = len(records) + len(appended)
+            appended.append((vec, rec))
+        else:
+            vectors[row] = vec
+            records[row] = rec
+        changed.append(row)
+
+    if appended:
+        vectors = np.concatenate([vectors, np.asarray([v for v, _ in appended], dtype=np.float16)])
+        records.extend(rec for _, rec in appended)
+    changed = np.asarray(sorted(set(changed)), dtype=np.int64)
+
+    tables = {}
+    for mode in GROUP_MODES:
+        rows = np.load(out_dir / f"{mode}_neighbors.npy")
+        scores = np.load(out_dir / f"{mode}_scores.npy").astype(np.float32)
+        if appended:
+            rows = np.concatenate([rows, np.full((len(appended), k), -1, dtype=np.int32)])
+            scores = np.concatenate([scores, np.full((len(appended), k), -np.inf, dtype=np.float32)])
+
+        stale = np.flatnonzero(np.isin(rows, np.union1d(changed, deleted)).any(axis=1))
+        recompute = np.setdiff1d(np.union1d(changed, stale), deleted)
+        rows[np.union1d(recompute, deleted)] = -1
+        scores[np.union1d(recompute, deleted)] = -np.inf
+
+        for members in group_rows(records, mode).values():
+            targets = np.intersect1d(members, recompute)
+            if len(targets):
+                rows[targets], scores[targets] = knn_blocked(vectors, targets, members, k)
+
+            others = np.setdiff1d(members, recompute)
+            sources = np.intersect1d(members, changed)
+            if len(others) and len(sources):
+                cand_rows, cand_scores = knn_blocked(vectors, others, sources, min(k, len(sources)))
+                merged_rows, merged_scores = _merge_topk(rows[others], scores[others], cand_rows, cand_scores, k)
+                rows[others], scores[others] = _finalize(merged_rows, merged_scores, k)
+
+        tables[mode] = (rows, scores)
+
+    _save_graph(out_dir, vectors, records, tables)
+    print(f"✅ 유사 장애 그래프 증분 갱신: 변경 {len(changed)}건 (신규 {len(appended)}건, "
+          f"삭제 {len(deleted)}건, {time.time() - start:.2f}초)")
+
+
+# ─────────────────────────────────────────────
+# ✅ API 조회용 (mmap + record_id 인덱스, 파일 갱신 시 자동 재로딩)
+# ─────────────────────────────────────────────
+class SimilarGraph:
+    def __init__(self, path: Path = SIMILAR_GRAPH_DIR):
+        self.path = Path(path)
+        self._loaded_mtime = None
+        self.records: List[dict] = []
+        self.row_of: Dict[str, int] = {}
+        self.tables = {}
+
+    def _maybe_reload(self):
+        mtime = os.stat(self.path / "records.json").st_mtime_ns
+        if mtime == self._loaded_mtime:
+            return
+        with open(self.path / "records.json", encoding="utf-8") as f:
+            self.records = json.load(f)
+        self.row_of = {
+            str(rec["record_id"]): row for row, rec in enumerate(self.records) if not rec.get("deleted")
+        }
+        self.tables = {
+            mode: (np.load(self.path / f"{mode}_neighbors.npy", mmap_mode="r"),
+                   np.load(self.path / f"{mode}_scores.npy", mmap_mode="r"))
+            for mode in GROUP_MODES
+        }
+        self._loaded_mtime = mtime
+
+    def similar(self, record_id: str, mode: str = "all", limit: int = 10) -> Optional[List[dict]]:
+        """유사 접수건 목록 (record_id 가 그래프에 없으면 None)"""
+        self._maybe_reload()
+        row = self.row_of.get(str(record_id))
+        if row is None:
+            return None
+
+        neighbors, scores = self.tables[mode]
+        results = []
+        for n, s in zip(neighbors[row][:limit], scores[row][:limit]):
+            if n < 0:
+                break
+            rec = self.records[n]
+            year, month, day = rec.get("year"), rec.get("month"), rec.get("day")
+            results.append({
+                "record_id": rec.get("record_id"),
+                "store_name": rec.get("store_name"),
+                "store_code": rec.get("store_code"),
+                "date": f"{year}-{str(month).zfill(2)}-{str(day).zfill(2)}" if year and month and day else "",
+                "title": rec.get("title"),
+                "fault_major": rec.get("fault_major"),
+                "fault_mid": rec.get("fault_mid"),
+                "fault_minor": rec.get("fault_minor"),
+                "score": round(float(s), 5),
+            })
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="유사 장애 그래프 생성 / 증분 갱신")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="전체 재계산")
+    build.add_argument("collections", nargs="*", default=SIMILAR_COLLECTIONS)
+    refresh = sub.add_parser("refresh", help="변경/삭제된 접수건만 증분 갱신")
+    refresh.add_argument("--collections", nargs="+", default=SIMILAR_COLLECTIONS,
+                         help="그래프를 만든 컬렉션 목록 (build 와 동일하게 지정)")
+    refresh.add_argument("record_ids", nargs="+")
+    args = parser.parse_args()
+
+    qdrant = QdrantClient(host="localhost", port=6333)
+    if args.command == "build":
+        build_similar_graph(qdrant, args.collections)
+    else:
+        refresh_similar_graph(qdrant, args.record_ids, args.collections)
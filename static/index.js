@@ -182,7 +182,7 @@ async function summarize(doc, targetId) {
             }
             typeWriter();
         } else {
-            targetDiv.innerText = "❌ 요약 실패";
+            targetDiv.innerText = data.error ? `❌ ${data.error}` : "❌ 요약 실패";
         }
 
     } catch (err) {
@@ -0,0 +1,187 @@
+"""
+임베디드 인덱스 ↔ Qdrant 정합성 테스트
+Qdrant 서버 없이 로컬 모드(QdrantClient(":memory:"))를 기준 결과로 사용
+"""
+import random
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue, MatchAny, Range,
+)
+from embedded_index import EmbeddedClient, export_collection, check_parity
+from qdrant_schema import fault_path, with_fault_path
+
+COLLECTION = "retailtech_test"
+DIM = 32
+KEYWORDS = ["포스", "냉장고", "전원", "네트워크", "프린터", "스캐너"]
+TOP_K = 20
+
+
+@pytest.fixture(scope="module")
+def clients(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    picker = random.Random(0)
+    qdrant = QdrantClient(":memory:")
+    qdrant.create_collection(COLLECTION, vectors_config=VectorParams(size=DIM, distance=Distance.COSINE))
+    qdrant.upsert(COLLECTION, [
+        PointStruct(
+            id=i,
+            vector=rng.normal(size=DIM).tolist(),
+            payload=with_fault_path({
+                "record_id": f"R{i:05d}",
+                "year": int(rng.integers(2021, 2026)),
+                "month": int(rng.integers(1, 13)),
+                "day": int(rng.integers(1, 29)),
+                "keywords": picker.sample(KEYWORDS, 2),
+                "store_code": f"S{i % 23:03d}",
+                "store_name": f"점포{i % 23}",
+                "sFileName": f"file_{i % 50}.txt",
+                "fault_major": "POS",
+                "fault_mid": f"M{i % 4}",
+                "fault_minor": f"m{i % 7}",
+                "text": f"장애 내용 {i}",
+            }),
+        )
+        for i in range(2000)
+    ])
+
+    root = tmp_path_factory.mktemp("embedded")
+    export_collection(qdrant, COLLECTION, root=str(root))
+    return qdrant, EmbeddedClient(str(root)), str(root)
+
+
+def _text_should(keywords):
+    """qdrant_utils.keyword_then_semantic_rerank 의 텍스트 키워드 조건과 동일한 형태"""
+    conditions = []
+    for kw in keywords:
+        conditions.extend([
+            FieldCondition(key="sFileName", match=MatchValue(value=kw)),
+            FieldCondition(key="keywords", match=MatchAny(any=[kw])),
+            FieldCondition(key="keywords", match={"text": kw}),
+        ])
+    return conditions
+
+
+FILTERS = {
+    "none": None,
+    "year": Filter(must=[FieldCondition(key="year", match=MatchValue(value=2024))]),
+    "date_and_text": Filter(must=[
+        FieldCondition(key="year", match=MatchValue(value=2023)),
+        FieldCondition(key="month", match=MatchValue(value=5)),
+        Filter(should=_text_should(["전원", "네트"])),
+    ]),
+    "text_only": Filter(should=_text_should(["프린터", "file_7.txt"])),
+    "store": Filter(should=[
+        FieldCondition(key="store_name", match=MatchValue(value="점포3")),
+        FieldCondition(key="store_code", match=MatchValue(value="S005")),
+    ]),
+    "must_not_range": Filter(must_not=[FieldCondition(key="month", range=Range(gte=3, lte=9))]),
+}
+
+
+def _queries(n=10, seed=1):
+    rng = np.random.default_rng(seed)
+    return [rng.normal(size=DIM).tolist() for _ in range(n)]
+
+
+@pytest.mark.parametrize("name", list(FILTERS))
+def test_search_matches_qdrant(clients, name):
+    qdrant, embedded, _ = clients
+    flt = FILTERS[name]
+    for q in _queries():
+        expected = qdrant.query_points(COLLECTION, query=q, query_filter=flt, limit=TOP_K).points
+        actual = embedded.search(COLLECTION, query_vector=q, query_filter=flt, limit=TOP_K)
+
+        expected_ids = {p.id for p in expected}
+        assert len(actual) == len(expected)
+        if expected_ids:
+            overlap = len(expected_ids & {p.id for p in actual}) / len(expected_ids)
+            assert overlap >= 0.9
+
+        expected_scores = {p.id: p.score for p in expected}
+        for p in actual:
+            if p.id in expected_scores:
+                assert abs(p.score - expected_scores[p.id]) < 1e-2
+
+
+@pytest.mark.parametrize("name", [n for n in FILTERS if n != "none"])
+def test_filter_only_query_matches_qdrant(clients, name):
+    qdrant, embedded, _ = clients
+    flt = FILTERS[name]
+    expected = qdrant.query_points(COLLECTION, query_filter=flt, limit=5000).points
+    actual = embedded.query_points(COLLECTION, query_filter=flt, limit=5000).points
+    assert {p.id for p in actual} == {p.id for p in expected}
+
+
+@pytest.mark.parametrize("group_by", ["store_code", "fault_path"])
+@pytest.mark.parametrize("name", ["none", "year", "text_only"])
+def test_groups_match_qdrant(clients, name, group_by):
+    qdrant, embedded, _ = clients
+    flt = FILTERS[name]
+    for q in _queries(5):
+        expected = qdrant.query_points_groups(
+            COLLECTION, query=q, query_filter=flt, group_by=group_by, limit=5, group_size=3
+        ).groups
+        actual = embedded.query_points_groups(
+            COLLECTION, query=q, query_filter=flt, group_by=group_by, limit=5, group_size=3
+        ).groups
+        assert [g.id for g in actual] == [g.id for g in expected]
+        assert [[h.id for h in g.hits] for g in actual] == [[h.id for h in g.hits] for g in expected]
+
+
+def test_fault_path_keeps_same_minor_apart(clients):
+    _, embedded, _ = clients
+    groups = embedded.query_points_groups(
+        COLLECTION, query=_queries(1)[0], group_by="fault_path", limit=28, group_size=1
+    ).groups
+    assert len(groups) == 28  # mid 4개 x minor 7개: minor 이름만으로 묶으면 7개
+    for g in groups:
+        p = g.hits[0].payload
+        assert g.id == f"{p['fault_major']}>{p['fault_mid']}>{p['fault_minor']}"
+
+
+def test_fault_path_keeps_incomplete_paths():
+    assert fault_path({"fault_major": "POS", "fault_mid": "M1", "fault_minor": "m2"}) == "POS>M1>m2"
+    assert fault_path({"fault_major": "POS", "fault_mid": "M1", "fault_minor": ""}) == "POS>M1>-"
+    assert fault_path({"fault_major": "POS"}) == "POS>->-"
+
+
+def test_groups_payload_selector_matches_qdrant(clients):
+    qdrant, embedded, _ = clients
+    q = _queries(1)[0]
+    kwargs = dict(query=q, group_by="store_code", limit=5, group_size=3, with_payload=["record_id", "title"])
+    expected = qdrant.query_points_groups(COLLECTION, **kwargs).groups
+    actual = embedded.query_points_groups(COLLECTION, **kwargs).groups
+    assert [[h.payload for h in g.hits] for g in actual] == [[h.payload for h in g.hits] for g in expected]
+    assert all(set(h.payload) == {"record_id"} for g in actual for h in g.hits)
+
+
+def test_groups_fill_sparse_groups(clients):
+    """상위 그룹 중 일부만 덜 찬 경우에도 Qdrant 와 같은 결과"""
+    qdrant, embedded, _ = clients
+    flt = Filter(should=[
+        FieldCondition(key="store_code", match=MatchValue(value="S005")),
+        FieldCondition(key="year", match=MatchValue(value=2024)),
+    ])
+    for q in _queries(5):
+        expected = qdrant.query_points_groups(
+            COLLECTION, query=q, query_filter=flt, group_by="store_code", limit=5, group_size=20
+        ).groups
+        actual = embedded.query_points_groups(
+            COLLECTION, query=q, query_filter=flt, group_by="store_code", limit=5, group_size=20
+        ).groups
+        assert [[h.id for h in g.hits] for g in actual] == [[h.id for h in g.hits] for g in expected]
+
+
+def test_payload_and_retrieve(clients):
+    qdrant, embedded, _ = clients
+    expected = {r.id: r.payload for r in qdrant.retrieve(COLLECTION, ids=[0, 17, 1999], with_payload=True)}
+    actual = {r.id: r.payload for r in embedded.retrieve(COLLECTION, ids=[0, 17, 1999])}
+    assert actual == expected
+
+
+def test_check_parity(clients):
+    qdrant, _, root = clients
+    report = check_parity(qdrant, COLLECTION, root=root, samples=10, top_k=TOP_K)
+    assert report["min_overlap"] >= 0.9
@@ -0,0 +1,102 @@
+"""
+LLM 스케줄러 테스트: 레인 우선순위 / 대기열 한도 / 대기 시간 초과 / 동일 요청 공유
+"""
+import asyncio
+import threading
+import time
+import pytest
+from llm_scheduler import LLMScheduler, LLMQueueFull, LLMQueueTimeout
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "대기 조건 시간 초과"
+        time.sleep(0.005)
+
+
+def _occupy(scheduler, release: threading.Event, lane="summary"):
+    """슬롯 하나를 release 될 때까지 점유하는 스레드"""
+    thread = threading.Thread(target=scheduler.run, args=(object(), release.wait, lane))
+    thread.start()
+    _wait_until(lambda: scheduler.stats()["active"] == 1)
+    return thread
+
+
+def test_search_lane_runs_before_queued_summaries():
+    scheduler = LLMScheduler(max_concurrency=1)
+    release = threading.Event()
+    blocker = _occupy(scheduler, release)
+
+    order = []
+    threads = []
+    for i, lane in enumerate(["summary", "summary", "search"]):
+        t = threading.Thread(target=scheduler.run, args=(i, lambda lane=lane, i=i: order.append((lane, i)), lane))
+        t.start()
+        threads.append(t)
+        _wait_until(lambda n=i + 1: sum(l["queue_depth"] for l in scheduler.stats()["lanes"].values()) == n)
+
+    release.set()
+    for t in [blocker, *threads]:
+        t.join(5)
+    assert order == [("search", 2), ("summary", 0), ("summary", 1)]
+
+
+def test_queue_timeout():
+    scheduler = LLMScheduler(max_concurrency=1, queue_timeouts={"summary": 0.05})
+    release = threading.Event()
+    blocker = _occupy(scheduler, release)
+
+    with pytest.raises(LLMQueueTimeout):
+        scheduler.run("late", lambda: "never", lane="summary")
+    release.set()
+    blocker.join(5)
+    assert scheduler.stats()["lanes"]["summary"]["rejected"] == 1
+
+
+def test_submit_rejects_when_lane_is_full():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue_depth={"summary": 1})
+    release = threading.Event()
+
+    async def scenario():
+        running = [asyncio.ensure_future(scheduler.submit("summary", release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(LLMQueueFull):
+            await scheduler.submit("summary", release.wait)
+        # 다른 레인은 영향 없음
+        assert await scheduler.submit("search", lambda: "ok") == "ok"
+        release.set()
+        await asyncio.gather(*running)
+
+    asyncio.run(scenario())
+    stats = scheduler.stats()["lanes"]["summary"]
+    assert stats["rejected"] == 1
+    assert stats["pending"] == 0
+
+
+def test_identical_inflight_prompts_run_once():
+    scheduler = LLMScheduler(max_concurrency=4)
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait()
+        return "결과"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(scheduler.run("같은 프롬프트", fn, "summary")))
+        for _ in range(3)
+    ]
+    threads[0].start()
+    _wait_until(lambda: calls)
+    for t in threads[1:]:
+        t.start()
+    _wait_until(lambda: scheduler.stats()["lanes"]["summary"]["deduped"] == 2)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert results == ["결과"] * 3
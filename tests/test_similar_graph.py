@@ -0,0 +1,68 @@
+"""
+유사 장애 그래프 증분 갱신 테스트: refresh 결과가 전체 재빌드와 같은지 확인
+"""
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, VectorParams, PointStruct, PointIdsList
+import similar_graph
+from similar_graph import GROUP_MODES, SimilarGraph, build_similar_graph, refresh_similar_graph
+
+COLLECTION = "retailtech_test"
+DIM = 16
+K = 8
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    """블록 경계 처리까지 확인하도록 블록 크기를 작게"""
+    monkeypatch.setattr(similar_graph, "QUERY_BLOCK_ROWS", 64)
+    monkeypatch.setattr(similar_graph, "CORPUS_BLOCK_ROWS", 100)
+
+
+def _point(i, rng):
+    return PointStruct(
+        id=i,
+        vector=rng.normal(size=DIM).tolist(),
+        payload={
+            "record_id": f"R{i}",
+            "store_code": f"S{i % 5}",
+            "fault_major": "POS",
+            "fault_mid": "M",
+            "fault_minor": f"m{i % 3}",
+            "year": 2024, "month": 1, "day": 2,
+        },
+    )
+
+
+def _comparable(results):
+    """float16 동점 순서 차이는 무시: 점수 목록 + 마지막 점수보다 높은 이웃 집합"""
+    scores = [r["score"] for r in results]
+    return scores, {r["record_id"] for r in results if scores and r["score"] > scores[-1]}
+
+
+def test_refresh_matches_rebuild(tmp_path, small_blocks):
+    rng = np.random.default_rng(0)
+    client = QdrantClient(":memory:")
+    client.create_collection(COLLECTION, vectors_config=VectorParams(size=DIM, distance=Distance.COSINE))
+    client.upsert(COLLECTION, [_point(i, rng) for i in range(400)])
+    build_similar_graph(client, [COLLECTION], tmp_path / "refreshed", k=K)
+
+    # 수정 2건, 신규 2건, 삭제 2건 (+ 없는 record_id 1건)
+    client.upsert(COLLECTION, [_point(i, rng) for i in [3, 50, 400, 401]])
+    client.delete(COLLECTION, points_selector=PointIdsList(points=[7, 99]))
+    refresh_similar_graph(client, ["R3", "R50", "R400", "R401", "R7", "R99", "R_missing"],
+                          [COLLECTION], tmp_path / "refreshed")
+    build_similar_graph(client, [COLLECTION], tmp_path / "rebuilt", k=K)
+
+    refreshed = SimilarGraph(tmp_path / "refreshed")
+    rebuilt = SimilarGraph(tmp_path / "rebuilt")
+    for i in range(402):
+        for mode in GROUP_MODES:
+            actual = refreshed.similar(f"R{i}", mode, K)
+            expected = rebuilt.similar(f"R{i}", mode, K)
+            if i in (7, 99):
+                assert actual is None and expected is None
+                continue
+            assert _comparable(actual) == _comparable(expected), (i, mode)
+            assert not {"R7", "R99"} & {r["record_id"] for r in actual}
@@ -1,19 +1,55 @@
+import os
+import time
 import requests
 import re
+from llm_scheduler import LLMScheduler, LLMOverloaded
 
 # ✅ vLLM API 서버 정보
 VLLM_API_URL = "http://localhost:8000/v1/completions"
 MODEL_ID = "/home/filadmin/ai-project/vllm/production-models/gemma-3-27b-it"
 
+# ✅ LLM 호출 스케줄러 (동시 실행 제한 + 검색 우선 + 대기 시간 제한)
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))
+LLM_QUEUE_TIMEOUTS = {
+    "search": float(os.environ.get("LLM_SEARCH_QUEUE_TIMEOUT", "3")),
+    "summary": float(os.environ.get("LLM_SUMMARY_QUEUE_TIMEOUT", "15")),
+}
+LLM_MAX_QUEUE_DEPTH = {
+    "search": int(os.environ.get("LLM_SEARCH_MAX_QUEUE", "32")),
+    "summary": int(os.environ.get("LLM_SUMMARY_MAX_QUEUE", "8")),
+}
+llm_scheduler = LLMScheduler(
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    queue_timeouts=LLM_QUEUE_TIMEOUTS,
+    max_queue_depth=LLM_MAX_QUEUE_DEPTH,
+)
+
+
 # ✅ 1️⃣ vLLM API 호출 함수
-def call_vllm(prompt, max_tokens=256, stop=None):
+def call_vllm(prompt, max_tokens=256, stop=None, lane="summary"):
+    """
+    스케줄러를 거쳐 vLLM 호출 (동일 프롬프트 실행 중이면 결과 공유)
+    대기열 시간 초과 시 LLMQueueTimeout 발생
+    """
+    return call_vllm_with_meta(prompt, max_tokens, stop, lane)["text"]
+
+
+def call_vllm_with_meta(prompt, max_tokens=256, stop=None, lane="summary"):
+    """call_vllm 과 동일하나 {"text", "finish_reason", "completion_tokens"} 반환"""
+    prompt = prompt.strip()
+    key = (prompt, max_tokens, tuple(stop or ()))
+    return llm_scheduler.run(key, lambda: _post_vllm(prompt, max_tokens, stop), lane=lane)
+
+
+def _post_vllm(prompt, max_tokens=256, stop=None):
+    """vLLM completions 호출 → {"text", "finish_reason", "completion_tokens"}"""
     try:
         response = requests.post(
             VLLM_API_URL,
             headers={"Content-Type": "application/json"},
             json={
                 "model": MODEL_ID,
-                "prompt": prompt.strip(),
+                "prompt": prompt,
                 "max_tokens": max_tokens,
                 "temperature": 0.4,
                 **({"stop": stop} if stop else {})
@@ -27,13 +63,20 @@ def call_vllm(prompt, max_tokens=256, stop=None):
 
         choices = result.get("choices", [])
         if choices and "text" in choices[0]:
-            return choices[0].get("text", "").strip()
+            finish_reason = choices[0].get("finish_reason")
+            if finish_reason == "length":
+                print(f"[⚠️ vLLM 출력이 max_tokens={max_tokens} 에서 잘림]")
+            return {
+                "text": choices[0].get("text", "").strip(),
+                "finish_reason": finish_reason,
+                "completion_tokens": (result.get("usage") or {}).get("completion_tokens"),
+            }
 
-        return "[⚠️ LLM 응답에 텍스트 없음]"
+        return {"text": "[⚠️ LLM 응답에 텍스트 없음]", "finish_reason": None, "completion_tokens": None}
 
     except requests.RequestException as e:
         print(f"[❌ vLLM 호출 실패]: {e}")
-        return "[❌ LLM 서버 연결 실패]"
+        return {"text": "[❌ LLM 서버 연결 실패]", "finish_reason": None, "completion_tokens": None}
 
 
 # ✅ 2️⃣ 검색 키워드 생성 함수
@@ -52,7 +95,7 @@ def call_vllm_generate_search_condition(user_question):
 질문: {user_question}
 
 키워드:"""
-    return call_vllm(prompt, max_tokens=32, stop=["\n"])
+    return call_vllm(prompt, max_tokens=32, stop=["\n"], lane="search")
 
 
 # ✅ 3️⃣ 키워드 후처리 함수
@@ -65,62 +108,172 @@ def clean_llm_keywords(raw_text: str) -> list:
     return [kw.strip() for kw in cleaned.split(",") if kw.strip()]
 
 
-def call_vllm_summarize_article(data: dict, user_question: str = None):
+# ✅ 4️⃣ 요약 프롬프트 토큰 예산
+SUMMARY_MAX_INPUT_TOKENS = int(os.environ.get("SUMMARY_MAX_INPUT_TOKENS", "1536"))
+SUMMARY_MAX_SENTENCES = 3
+# 한국어 한 문장 출력 토큰 여유치: 로그의 completion_tokens 분포(p99)를 보고 조정
+SUMMARY_TOKENS_PER_SENTENCE = int(os.environ.get("SUMMARY_TOKENS_PER_SENTENCE", "128"))
+SUMMARY_LENGTH_RETRY_FACTOR = 2        # finish_reason == "length" 시 max_tokens 를 늘려 1회 재시도
+SUMMARY_HEAD_RATIO = 0.7               # 본문 절단 시 앞부분 비율 (나머지는 끝부분)
+CHARS_PER_TOKEN_ESTIMATE = 1.5         # 토크나이저 로딩 실패 시 글자 수 기반 추정
+
+_tokenizer = None
+
+
+def get_tokenizer():
+    """MODEL_ID 경로의 토크나이저를 로컬에서 1회 로딩 (실패 시 None → 글자 수 추정)"""
+    global _tokenizer
+    if _tokenizer is None:
+        try:
+            from transformers import AutoTokenizer
+            _tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
+        except Exception as e:
+            print(f"[⚠️ 토크나이저 로딩 실패 → 글자 수 기반 추정 사용]: {e}")
+            _tokenizer = False
+    return _tokenizer or None
+
+
+def count_tokens(text: str) -> int:
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return int(len(text) / CHARS_PER_TOKEN_ESTIMATE) + 1
+    return len(tokenizer.encode(text, add_special_tokens=False))
+
+
+def truncate_head_tail(text: str, max_tokens: int):
+    """max_tokens 를 넘으면 앞/뒤만 남기고 중간 생략 → (본문, 원래 토큰 수)"""
+    tokenizer = get_tokenizer()
+    marker = " …(중략)… "
+
+    if tokenizer is None:
+        total = int(len(text) / CHARS_PER_TOKEN_ESTIMATE) + 1
+        if total <= max_tokens:
+            return text, total
+        max_chars = int(max_tokens * CHARS_PER_TOKEN_ESTIMATE)
+        if max_chars <= 0:
+            return "", total
+        head = int(max_chars * SUMMARY_HEAD_RATIO)
+        tail = max_chars - head
+        return text[:head] + marker + (text[-tail:] if tail else ""), total
+
+    ids = tokenizer.encode(text, add_special_tokens=False)
+    if len(ids) <= max_tokens:
+        return text, len(ids)
+    if max_tokens <= 0:
+        return "", len(ids)
+    head = int(max_tokens * SUMMARY_HEAD_RATIO)
+    tail = max_tokens - head
+    return (
+        tokenizer.decode(ids[:head], skip_special_tokens=True)
+        + marker
+        + (tokenizer.decode(ids[-tail:], skip_special_tokens=True) if tail else ""),
+        len(ids),
+    )
+
+
+def build_summary_prompt(data: dict, max_input_tokens: int = SUMMARY_MAX_INPUT_TOKENS,
+                         max_sentences: int = SUMMARY_MAX_SENTENCES):
     """
-    스토리텔링 요약용 LLM 호출 함수
-    :param data: dict 형태로 전달된 장애 데이터 (FastAPI에서 그대로 전달됨)
-    :param user_question: 선택적 사용자 질문 (기존 구조 유지)
+    요약 프롬프트 구성
+    - 고정 지시문을 맨 앞에 두어 vLLM prefix caching 적중 (점포명 등 가변 값은 뒤로)
+    - 장애 정보 필드는 항상 유지하고, 본문은 남은 토큰 예산만큼 앞/뒤만 사용
+    :return: (prompt, max_tokens, stats)
     """
-
-    # 🔹 데이터 정리
     content = clean_article_text(data.get("content", ""))
     store_name = data.get("store_name", "")
-    date = data.get("date", "")
-    fault_major = data.get("fault_major", "")
-    fault_mid = data.get("fault_mid", "")
-    fault_minor = data.get("fault_minor", "")
-    ocs_major = data.get("ocs_cause_major", "")
-    ocs_mid = data.get("ocs_cause_mid", "")
-    ocs_minor = data.get("ocs_cause_minor", "")
-    department = data.get("department_main", "")
-    urgency = data.get("urgency", "")
-
-    # 🔸 프롬프트 구성
-    prompt = f"""
-다음은 {store_name} 점포에서 발생한 장애 내역입니다.
+
+    instructions = f"""
+다음은 점포에서 발생한 장애 내역입니다.
 현장 엔지니어가 상급 관리자에게 구두로 보고하듯, 자연스럽고 간결한 스토리텔링 형식으로 정리해 주세요.
 
 조건:
 - "요약"이라는 단어를 사용하지 말 것
-- 세 문장 이내로 간결하게 작성
+- {max_sentences}문장 이내로 간결하게 작성
 - 장애 발생 → 원인 → 조치/결과 순서로 기술
 - 긴급도(A~C)는 문맥에 녹여 자연스럽게 반영할 것
 - 숫자, 코드명(VKV47 등)은 정확하게 유지할 것
-- 장애 원인과 처리 결과만 간결하게 2~3문장으로 정리
+- 장애 원인과 처리 결과만 간결하게 정리
 - 사실 근거가 없는 추론 문장은 작성하지 말 것
+"""
 
-📅 날짜: {date}
+    fields = f"""
+📅 날짜: {data.get("date", "")}
 🏪 점포명: {store_name}
-⚙️ 장애유형: {fault_major} > {fault_mid} > {fault_minor}
+⚙️ 장애유형: {data.get("fault_major", "")} > {data.get("fault_mid", "")} > {data.get("fault_minor", "")}
 🧩 OCS 원인:
-  - 대분류: {ocs_major}
-  - 중분류: {ocs_mid}
-  - 소분류: {ocs_minor}
-🏢 처리부서: {department}
-🚨 긴급도: {urgency}
+  - 대분류: {data.get("ocs_cause_major", "")}
+  - 중분류: {data.get("ocs_cause_mid", "")}
+  - 소분류: {data.get("ocs_cause_minor", "")}
+🏢 처리부서: {data.get("department_main", "")}
+🚨 긴급도: {data.get("urgency", "")}
 
 [본문]
-{content}
 """
 
-    # 🔸 vLLM 호출 (max_tokens은 상황에 맞게)
-    raw_summary = call_vllm(prompt, max_tokens=1024)
+    fixed_tokens = count_tokens(instructions + fields)
+    body_budget = max(0, max_input_tokens - fixed_tokens)
+    body, body_tokens = truncate_head_tail(content, body_budget)
+
+    prompt = instructions + fields + body
+    max_tokens = max_sentences * SUMMARY_TOKENS_PER_SENTENCE
+    prompt_tokens = count_tokens(prompt)
+    truncated = body != content
+    untrimmed_tokens = fixed_tokens + body_tokens if truncated else prompt_tokens
+    stats = {
+        "prefill_tokens": prompt_tokens,
+        "prefill_tokens_untrimmed": untrimmed_tokens,
+        "prefill_tokens_saved": max(0, untrimmed_tokens - prompt_tokens),
+        "body_truncated": truncated,
+        "max_tokens": max_tokens,
+    }
+    return prompt, max_tokens, stats
+
+
+def summarize_with_stats(data: dict, max_sentences: int = SUMMARY_MAX_SENTENCES):
+    """요약 + 프롬프트 토큰 / 지연시간 통계"""
+    prompt, max_tokens, stats = build_summary_prompt(data, max_sentences=max_sentences)
+
+    start = time.time()
+    result = call_vllm_with_meta(prompt, max_tokens=max_tokens, lane="summary")
+    retried = False
+    if result["finish_reason"] == "length":
+        # 출력 여유치 부족 → 한 번만 늘려서 재시도, 그래도 잘리면 마지막 완결 문장까지만 사용
+        retried = True
+        max_tokens *= SUMMARY_LENGTH_RETRY_FACTOR
+        result = call_vllm_with_meta(prompt, max_tokens=max_tokens, lane="summary")
+
+    raw_summary = result["text"]
+    if result["finish_reason"] == "length":
+        raw_summary = trim_to_last_sentence(raw_summary)
+
+    stats.update({
+        "max_tokens": max_tokens,
+        "completion_tokens": result["completion_tokens"],
+        "finish_reason": result["finish_reason"],
+        "length_retried": retried,
+        "llm_latency_ms": round((time.time() - start) * 1000, 1),
+    })
+    print(f"📏 요약 프롬프트 통계: {stats}")
 
     # 🔸 후처리: 의미 유지한 문장 정리
-    return clean_sentences_preserve_meaning(raw_summary)
+    return clean_sentences_preserve_meaning(raw_summary), stats
+
 
+def trim_to_last_sentence(text: str) -> str:
+    """잘린 출력에서 마지막 완결 문장까지만 남김 (완결 문장이 없으면 그대로)"""
+    ends = [m.end() for m in re.finditer(r'[.!?。](?=\s|$)', text)]
+    return text[:ends[-1]] if ends else text
 
 
+def call_vllm_summarize_article(data: dict, user_question: str = None):
+    """
+    스토리텔링 요약용 LLM 호출 함수
+    :param data: dict 형태로 전달된 장애 데이터 (FastAPI에서 그대로 전달됨)
+    :param user_question: 선택적 사용자 질문 (기존 구조 유지)
+    """
+    summary, _ = summarize_with_stats(data)
+    return summary
+
 
 # ✅ 5️⃣ 문장 정제 함수
 def clean_sentences_preserve_meaning(text: str) -> str: